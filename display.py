@@ -1,29 +1,52 @@
-import json
 import sys
 import logging
 import pathlib
-import requests
 import re
 import os
 import os.path
-import time
 import io
 import asyncio
-import traceback
+import configparser
+import multiprocessing
+import signal
 import aiohttp
-from PIL import Image
 
 from src.config import TEMP_DEFAULTS, ConfigHandler
-from watchdog.observers import Observer
-from watchdog.events import PatternMatchingEventHandler
+from collections import OrderedDict, deque
+from functools import lru_cache, partial
+from operator import itemgetter
 from math import ceil
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from urllib.parse import quote
 
+try:
+    # orjson is optional, it parses and encodes bytes directly and is a lot
+    # faster on the Moonraker status stream. It is left out of requirements.txt
+    # as boards without a prebuilt wheel would have to compile it, install it
+    # into the venv by hand where one exists.
+    from orjson import loads as json_loads, dumps as json_dumps
+except ImportError:
+    import json
+
+    json_loads = json.loads
+
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+
+try:
+    # uvloop is optional as well, a libuv based loop with cheaper callbacks
+    # and socket reads. Not in requirements.txt for the same reason.
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
 from src.tjc import EventType
 from src.response_actions import response_actions, input_actions, custom_touch_actions
-from src.lib_col_pic import parse_thumbnail
 from src.communicator import DisplayCommunicator
+from src.inotify_watcher import IN_CLOSE_WRITE, IN_CREATE, IN_MOVED_TO, InotifyWatcher
 from src.neptune4 import (
     MODEL_N4_REGULAR,
     MODEL_N4_PRO,
@@ -69,7 +92,7 @@ ch_log.setLevel(logging.DEBUG)
 formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 ch_log.setFormatter(formatter)
 logger.addHandler(ch_log)
-file_log = logging.FileHandler(log_file)
+file_log = logging.FileHandler(log_file, delay=True)
 file_log.setLevel(logging.ERROR)
 file_log.setFormatter(formatter)
 logger.addHandler(file_log)
@@ -78,53 +101,105 @@ logger.setLevel(logging.DEBUG)
 comms_directory = os.path.expanduser("~/printer_data/comms")
 config_file = os.path.expanduser("~/printer_data/config/display_connector.cfg")
 
-PRINTING_PAGES = [
-    PAGE_PRINTING,
-    PAGE_PRINTING_FILAMENT,
-    PAGE_PRINTING_PAUSE,
-    PAGE_PRINTING_STOP,
-    PAGE_PRINTING_EMERGENCY_STOP,
-    PAGE_PRINTING_FILAMENT,
-    PAGE_PRINTING_SPEED,
-    PAGE_PRINTING_ADJUST,
-]
+PRINTING_PAGES = frozenset(
+    {
+        PAGE_PRINTING,
+        PAGE_PRINTING_FILAMENT,
+        PAGE_PRINTING_PAUSE,
+        PAGE_PRINTING_STOP,
+        PAGE_PRINTING_EMERGENCY_STOP,
+        PAGE_PRINTING_SPEED,
+        PAGE_PRINTING_ADJUST,
+    }
+)
 
-TABBED_PAGES = [
-    PAGE_PREPARE_EXTRUDER,
-    PAGE_PREPARE_MOVE,
-    PAGE_PREPARE_TEMP,
-    PAGE_PRINTING_ADJUST,
-    PAGE_PRINTING_FILAMENT,
-    PAGE_PRINTING_SPEED,
-]
+TABBED_PAGES = frozenset(
+    {
+        PAGE_PREPARE_EXTRUDER,
+        PAGE_PREPARE_MOVE,
+        PAGE_PREPARE_TEMP,
+        PAGE_PRINTING_ADJUST,
+        PAGE_PRINTING_FILAMENT,
+        PAGE_PRINTING_SPEED,
+    }
+)
+
+TRANSITION_PAGES = frozenset({PAGE_OVERLAY_LOADING})
+
+# Anything other than "+" has always been treated as a decrease
+ADJUST_SIGN = {"+": 1, "-": -1}
+
+GCODE_EXTENSIONS = (".gcode", ".g", ".gco")
 
-TRANSITION_PAGES = [PAGE_OVERLAY_LOADING]
+SUPPORTED_PRINTERS = (MODEL_N4_REGULAR, MODEL_N4_PRO, MODEL_N4_PLUS, MODEL_N4_MAX)
 
-SUPPORTED_PRINTERS = [MODEL_N4_REGULAR, MODEL_N4_PRO, MODEL_N4_PLUS, MODEL_N4_MAX]
+PRINTER_MODEL_FILE = "/boot/.OpenNept4une.txt"
+
+
+_MODEL_FAMILIES = {
+    **{model: "n4" for model in MODELS_N4},
+    **{model: "n3" for model in MODELS_N3},
+    MODEL_CUSTOM: "custom",
+}
+
+_COMMUNICATORS = {
+    ("openneptune", "n4"): OpenNeptune4DisplayCommunicator,
+    ("openneptune", "n3"): OpenNeptune3DisplayCommunicator,
+    ("openneptune", "custom"): CustomDisplayCommunicator,
+    ("elegoo", "n4"): ElegooNeptune4DisplayCommunicator,
+    ("elegoo", "n3"): ElegooNeptune3DisplayCommunicator,
+    ("elegoo", "custom"): CustomDisplayCommunicator,
+}
 
 
 def get_communicator(display, model) -> DisplayCommunicator:
-    if display == "openneptune":
-        if model == MODEL_CUSTOM:
-            return CustomDisplayCommunicator
-        elif model in MODELS_N4:
-            return OpenNeptune4DisplayCommunicator
-        elif model in MODELS_N3:
-            return OpenNeptune3DisplayCommunicator
-    else:
-        if model == MODEL_CUSTOM:
-            return CustomDisplayCommunicator
-        elif model in MODELS_N4:
-            return ElegooNeptune4DisplayCommunicator
-        elif model in MODELS_N3:
-            return ElegooNeptune3DisplayCommunicator
+    display_key = "openneptune" if display == "openneptune" else "elegoo"
+    # Unknown models fall back to the Neptune 4 family and its default mapper
+    return _COMMUNICATORS[(display_key, _MODEL_FAMILIES.get(model, "n4"))]
 
 
 SOCKET_LIMIT = 20 * 1024 * 1024
+THREAD_POOL_SIZE = 2
+HISTORY_LIMIT = 64
+CONFIG_RELOAD_DELAY = 0.5
+DISPLAY_TASK_LIMIT = 8
+THUMBNAIL_FETCH_TIMEOUT = 5
+MAX_THUMBNAIL_BYTES = 4 * 1024 * 1024
+SHUTDOWN_TIMEOUT = 5
+SHUTDOWN_REQUEST_TIMEOUT = 3
+THUMBNAIL_CACHE_SIZE = 4
+
+_RPC_ID_PLACEHOLDER = "__rpc_id__"
+_RPC_ID_TOKEN = json_dumps(_RPC_ID_PLACEHOLDER)
+
+
+def _config_int(value):
+    # Klipper reports config values as the raw strings from printer.cfg, which
+    # may carry a fractional part ("235.5"). Truncate without a float() parse.
+    return int(str(value).partition(".")[0] or 0)
+
+
+def _decode_thumbnail(img_data, width, height, background):
+    # Runs in the thumbnail worker process. Pillow and numpy are only needed
+    # there, keep them out of the main process.
+    from PIL import Image
+    from src.lib_col_pic import parse_thumbnail
+
+    with Image.open(io.BytesIO(img_data)) as thumbnail:
+        return parse_thumbnail(thumbnail, width, height, background)
+
+
+@lru_cache(maxsize=128)
+def _encode_rpc_template(method, params):
+    # Encoded request with a placeholder id, patched per request. Repeated
+    # calls (same gcode, same query) skip JSON encoding entirely.
+    message = {"jsonrpc": "2.0", "method": method, "id": _RPC_ID_PLACEHOLDER}
+    if params:
+        message["params"] = dict(params)
+    return json_dumps(message) + b"\x03"
 
 
 class DisplayController:
-    last_config_change = 0
     filament_sensor_name = "filament_sensor"
 
     def __init__(self, config):
@@ -140,10 +215,9 @@ class DisplayController:
             event_handler=self.display_event_handler,
             port=self.config.safe_get("general", "serial_port"),
         )
+        self._page_map_cache = {}
         self._handle_display_config()
 
-        # Initialize lock for current_filename
-        self._filename_lock = asyncio.Lock()
         self.current_filename = None
 
         self.part_light_state = False
@@ -155,11 +229,10 @@ class DisplayController:
         self.xy_move_speed = 130
         self.z_move_speed = 10
         self.z_offset_distance = "0.01"
-        self.out_fd = sys.stdout.fileno()
-        os.set_blocking(self.out_fd, False)
-        self.pending_req = {}
         self.pending_reqs = {}
-        self.history = []
+        self._next_rpc_id = 1
+        self._write_buffer = bytearray()
+        self.history = deque(maxlen=HISTORY_LIMIT)
         self.current_state = "booting"
 
         self.dir_contents = []
@@ -197,82 +270,138 @@ class DisplayController:
         self.bed_leveling_last_position = None
 
         self.klipper_restart_event = asyncio.Event()
+        self._http_session = None
+        self._pending_config_reload = None
+        self._thumbnail_gen = 0
+        self._thumbnail_fetch = None
+        self._thumbnail_executor = None
+        self._thumbnail_cache = OrderedDict()
+        self._background_tasks = set()
+        self._display_sem = asyncio.Semaphore(DISPLAY_TASK_LIMIT)
+        self._speed_ui_pending = False
+
+        self._build_action_handlers()
+        self._build_status_handlers()
+        self._notify_handlers = {
+            "notify_status_update": self.handle_status_update,
+            "notify_gcode_response": self.handle_gcode_response,
+        }
+
+    def _spawn(self, coro):
+        # Keep a strong reference until the task is done, the loop only holds
+        # weak references to fire-and-forget tasks
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _spawn_display(self, coro):
+        # Display updates fanned out from status updates share the serial
+        # link, so cap how many run at once
+        return self._spawn(self._run_bounded(coro))
+
+    async def _run_bounded(self, coro):
+        try:
+            async with self._display_sem:
+                await coro
+        finally:
+            # Cancelled while still waiting for a slot, the coroutine was never
+            # started. Closing one that already finished does nothing.
+            coro.close()
 
     def pathname2url(self, path):
         return quote(path.replace("\\", "/"))
 
     def handle_config_change(self):
-        if self.last_config_change + 5 > time.time():
-            return
-        self.last_config_change = time.time()
+        # A single save usually fires several file events, reload once per burst
+        if self._pending_config_reload is not None:
+            self._pending_config_reload.cancel()
+        self._pending_config_reload = self._loop.call_later(
+            CONFIG_RELOAD_DELAY, self._apply_config_reload
+        )
+
+    def _apply_config_reload(self):
+        self._pending_config_reload = None
+        self._spawn(self._reload_config())
+
+    async def _reload_config(self):
         logger.info("Config file changed, Reloading")
-        self._loop.create_task(self._navigate_to_page(PAGE_OVERLAY_LOADING))
-        self.config.reload_config()
-        self._handle_config()
-        self._go_back()
+        try:
+            await self._navigate_to_page(PAGE_OVERLAY_LOADING)
+        except Exception as e:
+            # The overlay is only cosmetic, reload and go back regardless
+            logger.error("Failed to show the loading overlay: %r", e)
+        try:
+            self.config.reload_config()
+            self._handle_config()
+        except (OSError, ValueError, configparser.Error, re.error) as e:
+            # Usually a half-written or mistyped file, the next save reloads
+            logger.error("Failed to reload config: %r", e)
+        finally:
+            # The background color of cached thumbnails may have changed
+            self._thumbnail_cache.clear()
+            self._go_back()
 
     def _handle_config(self):
         logger.info("Loading config")
-        if "general" in self.config:
-            if "clean_filename_regex" in self.config["general"]:
+        general = self.config.get_section("general")
+        if general is not None:
+            if "clean_filename_regex" in general:
                 filename_regex_wrapper["default"] = re.compile(
-                    self.config["general"]["clean_filename_regex"]
+                    general["clean_filename_regex"]
                 )
-            if "filament_sensor_name" in self.config["general"]:
-                self.filament_sensor_name = self.config["general"][
-                    "filament_sensor_name"
-                ]
+            self.filament_sensor_name = general.get(
+                "filament_sensor_name", self.filament_sensor_name
+            )
+
+        logging_config = self.config.get_section("LOGGING")
+        if logging_config is not None and "file_log_level" in logging_config:
+            file_log.setLevel(logging_config["file_log_level"])
+            logger.setLevel(logging.DEBUG)
 
-        if "LOGGING" in self.config:
-            if "file_log_level" in self.config["LOGGING"]:
-                file_log.setLevel(self.config["LOGGING"]["file_log_level"])
-                logger.setLevel(logging.DEBUG)
-        if "prepare" in self.config:
-            prepare = self.config["prepare"]
-            if "move_distance" in prepare:
-                distance = prepare["move_distance"]
-                if distance in ["0.1", "1", "10"]:
-                    self.move_distance = distance
+        prepare = self.config.get_section("prepare")
+        if prepare is not None:
+            distance = prepare.get("move_distance")
+            if distance in ("0.1", "1", "10"):
+                self.move_distance = distance
             self.xy_move_speed = prepare.getint("xy_move_speed", fallback=130)
             self.z_move_speed = prepare.getint("z_move_speed", fallback=10)
             self.extrude_amount = prepare.getint("extrude_amount", fallback=50)
             self.extrude_speed = prepare.getint("extrude_speed", fallback=300)
 
     def _handle_display_config(self):
+        self._page_map_cache.clear()
         self.display.mapper.set_filament_sensor_name(self.filament_sensor_name)
-        if "main_screen" in self.config:
-            if "display_name" in self.config["main_screen"]:
-                self.display.display_name_override = self.config["main_screen"][
-                    "display_name"
-                ]
-            if "display_name_line_color" in self.config["main_screen"]:
-                self.display.display_name_line_color = self.config["main_screen"][
+        main_screen = self.config.get_section("main_screen")
+        if main_screen is not None:
+            if "display_name" in main_screen:
+                self.display.display_name_override = main_screen["display_name"]
+            if "display_name_line_color" in main_screen:
+                self.display.display_name_line_color = main_screen[
                     "display_name_line_color"
                 ]
-        if "print_screen" in self.config:
-            if "z_display" in self.config["print_screen"]:
-                self.display.mapper.set_z_display(
-                    self.config["print_screen"]["z_display"]
-                )
-            if "clean_filename_regex" in self.config["print_screen"]:
+        print_screen = self.config.get_section("print_screen")
+        if print_screen is not None:
+            if "z_display" in print_screen:
+                self.display.mapper.set_z_display(print_screen["z_display"])
+            if "clean_filename_regex" in print_screen:
                 filename_regex_wrapper["printing"] = re.compile(
-                    self.config["print_screen"]["clean_filename_regex"]
+                    print_screen["clean_filename_regex"]
                 )
 
     def get_printer_model(self):
-        if "general" in self.config:
-            if "printer_model" in self.config["general"]:
-                return self.config["general"]["printer_model"]
+        general = self.config.get_section("general")
+        if general is not None and "printer_model" in general:
+            return general["printer_model"]
         try:
-            with open("/boot/.OpenNept4une.txt", "r") as file:
-                for line in file:
-                    if line.startswith(tuple(SUPPORTED_PRINTERS)):
-                        model_part = line.split("-")[0].strip()
-                        return model_part
+            data = pathlib.Path(PRINTER_MODEL_FILE).read_text(errors="ignore")
+            for line in data.splitlines():
+                if line.startswith(SUPPORTED_PRINTERS):
+                    return line.split("-")[0].strip()
         except FileNotFoundError:
             logger.error("File not found")
         except Exception as e:
-            logger.error(f"Error reading file: {e}")
+            logger.error("Error reading file: %s", e)
         return None
 
     async def special_page_handling(self, current_page):
@@ -293,7 +422,7 @@ class DisplayController:
                 self.temperature_preset_bed,
             )
         elif current_page == PAGE_CONFIRM_PRINT:
-            self._loop.create_task(self.set_data_prepare_screen(self.current_filename))
+            self._spawn(self.set_data_prepare_screen(self.current_filename))
         elif current_page == PAGE_PRINTING_FILAMENT:
             await self.display.update_printing_heater_settings_ui(
                 self.printing_selected_heater,
@@ -318,370 +447,453 @@ class DisplayController:
             self.leveling_mode = None
         elif current_page == PAGE_LEVELING_SCREW_ADJUST:
             await self.display.draw_initial_screw_leveling()
-            self._loop.create_task(self.handle_screw_leveling())
+            self._spawn(self.handle_screw_leveling())
         elif current_page == PAGE_LEVELING_Z_OFFSET_ADJUST:
             await self.display.draw_initial_zprobe_leveling(self.z_probe_step, self.z_probe_distance)
-            self._loop.create_task(self.handle_zprobe_leveling())
+            self._spawn(self.handle_zprobe_leveling())
         elif current_page == PAGE_PRINTING_KAMP:
             await self.display.draw_kamp_page(self.bed_leveling_counts)
 
         await self.display.special_page_handling(current_page)
 
     async def send_gcodes_async(self, gcodes):
-        for gcode in gcodes:
-            logger.debug("Sending GCODE: " + gcode)
-            await self._send_moonraker_request(
-                "printer.gcode.script", {"script": gcode}
-            )
-            await asyncio.sleep(0.1)
+        # Klipper runs a multi-line script in order, so one request suffices
+        script = "\n".join(gcodes)
+        logger.debug("Sending GCODE: %s", script)
+        await self._send_moonraker_request(
+            "printer.gcode.script", {"script": script}
+        )
 
     def send_gcode(self, gcode):
-        logger.debug("Sending GCODE: " + gcode)
-        self._loop.create_task(
-            self._send_moonraker_request("printer.gcode.script", {"script": gcode})
+        logger.debug("Sending GCODE: %s", gcode)
+        # Nobody waits for the reply, so skip the task and queue the write
+        _, data = self._prepare_moonraker_request(
+            "printer.gcode.script", {"script": gcode}
         )
+        self._queue_write(data)
 
     def move_axis(self, axis, distance):
-        speed = self.xy_move_speed if axis in ["X", "Y"] else self.z_move_speed
+        speed = self.xy_move_speed if axis in ("X", "Y") else self.z_move_speed
         self.send_gcode(f"G91\nG1 {axis}{distance} F{int(speed) * 60}\nG90")
 
     async def _navigate_to_page(self, page, clear_history=False):
-        if not self.history or self.history[-1] != page:
-            # Handle page navigation within tabbed pages
-            if page in TABBED_PAGES and self.history and self.history[-1] in TABBED_PAGES:
-                self.history[-1] = page
-            else:
-                if clear_history:
-                    self.history.clear()
+        if self.history and self.history[-1] == page:
+            # Already on this page, only drop what is behind it if asked to
+            if clear_history and len(self.history) > 1:
+                self.history.clear()
                 self.history.append(page)
-            
-            # Start navigation task asynchronously
-            mapped_page = self.display.mapper.map_page(page)
-            await self.display.navigate_to(mapped_page)
-            
-            logger.debug(f"Navigating to {page}")
-            
-            # Handle any special page logic
-            await self.special_page_handling(page)
+            return
+
+        # Handle page navigation within tabbed pages
+        if page in TABBED_PAGES and self.history and self.history[-1] in TABBED_PAGES:
+            self.history[-1] = page
+        else:
+            if clear_history:
+                self.history.clear()
+            self.history.append(page)
+
+        # Start navigation task asynchronously
+        mapped_page = self._page_id(page)
+        await self.display.navigate_to(mapped_page)
+
+        logger.debug("Navigating to %s", page)
+
+        # Handle any special page logic
+        await self.special_page_handling(page)
+
+    def _build_action_handlers(self):
+        self._action_handlers = {
+            "toggle_part_light": self._action_toggle_part_light,
+            "toggle_frame_light": self._action_toggle_frame_light,
+            "toggle_filament_sensor": self._action_toggle_filament_sensor,
+            "toggle_fan": self._action_toggle_fan,
+            "go_back": self._go_back,
+            "emergency_stop": self._action_emergency_stop,
+            "pause_print_button": self._action_pause_print_button,
+            "pause_print_confirm": self._action_pause_print_confirm,
+            "stop_print": self._action_stop_print,
+            "files_picker": self._action_files_picker,
+            "temp_reset": self._action_temp_reset,
+            "speed_reset": self._action_speed_reset,
+            "print_opened_file": self._action_print_opened_file,
+            "confirm_complete": self._action_confirm_complete,
+            "save_temp_preset": self._action_save_temp_preset,
+            "retry_screw_leveling": self._action_retry_screw_leveling,
+            "begin_full_bed_level": self._action_begin_full_bed_level,
+            "abort_zprobe": self._action_abort_zprobe,
+            "save_zprobe": self._action_save_zprobe,
+            "save_config": self._action_save_config,
+            "reboot_host": self._action_reboot_host,
+            "shutdown_host": self._action_shutdown_host,
+            "reboot_klipper": self._action_reboot_klipper,
+            "firmware_restart": self._action_firmware_restart,
+        }
+        prefix_handlers = (
+            ("move_", self._action_move),
+            ("set_distance_", self._action_set_distance),
+            ("zoffset_", self._action_zoffset),
+            ("zoffsetchange_", self._action_zoffsetchange),
+            ("printer.send_gcode", self._action_send_gcode),
+            ("page ", self._action_page),
+            ("temp_heater_", self._action_temp_heater),
+            ("temp_increment_", self._action_temp_increment),
+            ("temp_adjust_", self._action_temp_adjust),
+            ("speed_type_", self._action_speed_type),
+            ("speed_increment_", self._action_speed_increment),
+            ("speed_adjust_", self._action_speed_adjust),
+            ("files_page_", self._action_files_page),
+            ("open_file_", self._action_open_file),
+            ("set_temp_", self._action_set_temp),
+            ("set_preset_temp_", self._action_set_preset_temp),
+            ("set_extrude_amount_", self._action_set_extrude_amount),
+            ("set_extrude_speed_", self._action_set_extrude_speed),
+            ("extrude_", self._action_extrude),
+            ("start_temp_preset_", self._action_start_temp_preset),
+            ("preset_temp_step_", self._action_preset_temp_step),
+            ("preset_temp_", self._action_preset_temp),
+            ("zprobe_step_", self._action_zprobe_step),
+            ("zprobe_", self._action_zprobe),
+            ("set_speed_", self._action_set_speed),
+            ("set_flow_", self._action_set_flow),
+        )
+        # Longest prefix first, so "preset_temp_step_" wins over "preset_temp_"
+        self._action_prefix_handlers = tuple(
+            sorted(prefix_handlers, key=lambda item: len(item[0]), reverse=True)
+        )
 
     def execute_action(self, action):
-        if action.startswith("move_"):
-            parts = action.split("_")
-            axis = parts[1].upper()
-            direction = parts[2]
-            self.move_axis(axis, direction + self.move_distance)
-        elif action.startswith("set_distance_"):
-            parts = action.split("_")
-            self.move_distance = parts[2]
-            self._loop.create_task(
-                self.display.update_prepare_move_ui(self.move_distance)
-            )
-        if action.startswith("zoffset_"):
-            parts = action.split("_")
-            direction = parts[1]
-            self.send_gcode(
-                f"SET_GCODE_OFFSET Z_ADJUST={direction}{self.z_offset_distance} MOVE=1"
-            )
-        elif action.startswith("zoffsetchange_"):
-            parts = action.split("_")
-            self.z_offset_distance = parts[1]
-            self._loop.create_task(
-                self.display.update_printing_zoffset_increment_ui(
-                    self.z_offset_distance
-                )
-            )
-        elif action == "toggle_part_light":
-            self.part_light_state = not self.part_light_state
-            self._set_light("Part_Light", self.part_light_state)
-        elif action == "toggle_frame_light":
-            self.frame_light_state = not self.frame_light_state
-            self._set_light("Frame_Light", self.frame_light_state)
-        elif action == "toggle_filament_sensor":
-            self.filament_sensor_state = not self.filament_sensor_state
-            self._toggle_filament_sensor(self.filament_sensor_state)
-        elif action == "toggle_fan":
-            self.fan_state = not self.fan_state
-            self._toggle_fan(self.fan_state)
-        elif action.startswith("printer.send_gcode"):
-            gcode = action.split("'")[1]
-            self.send_gcode(gcode)
-        elif action == "go_back":
-            self._go_back()
-        elif action.startswith("page"):
-            self._loop.create_task(self._navigate_to_page(action.split(" ")[1]))
-        elif action == "emergency_stop":
-            logger.info("Executing emergency stop!")
-            self._loop.create_task(
-                self._send_moonraker_request("printer.emergency_stop")
-            )
-        elif action == "pause_print_button":
-            self._loop.create_task(self._handle_pause_resume())
-        elif action == "pause_print_confirm":
-            self._loop.create_task(self._handle_pause_confirm())
-        elif action == "stop_print":
-            self._go_back()
-            self._loop.create_task(self._navigate_to_page(PAGE_OVERLAY_LOADING))
-            logger.info("Stopping print")
-            self._loop.create_task(self._send_moonraker_request("printer.print.cancel"))
-        elif action == "files_picker":
-            self._loop.create_task(self._navigate_to_page(PAGE_FILES))
-            self._loop.create_task(self._load_files())
-
-        elif action.startswith("temp_heater_"):
-            parts = action.split("_")
-            self.printing_selected_heater = "_".join(parts[2:])
-            self._loop.create_task(
-                self.display.update_printing_heater_settings_ui(
-                    self.printing_selected_heater,
-                    self.printing_target_temps[self.printing_selected_heater],
-                )
-            )
-        elif action.startswith("temp_increment_"):
-            parts = action.split("_")
-            self.printing_selected_temp_increment = parts[2]
-            self._loop.create_task(
-                self.display.update_printing_temperature_increment_ui(
-                    self.printing_selected_temp_increment
-                )
-            )
-        elif action.startswith("temp_adjust_"):
-            parts = action.split("_")
-            direction = parts[2]
-            current_temp = self.printing_target_temps[self.printing_selected_heater]
-            self.send_gcode(
-                "SET_HEATER_TEMPERATURE HEATER="
-                + self.printing_selected_heater
-                + " TARGET="
-                + str(
-                    current_temp
-                    + (
-                        int(self.printing_selected_temp_increment)
-                        * (1 if direction == "+" else -1)
-                    )
-                )
-            )
-        elif action == "temp_reset":
-            self.send_gcode(
-                "SET_HEATER_TEMPERATURE HEATER="
-                + self.printing_selected_heater
-                + " TARGET=0"
-            )
-        elif action.startswith("speed_type_"):
-            parts = action.split("_")
-            self.printing_selected_speed_type = parts[2]
-            self._loop.create_task(
-                self.display.update_printing_speed_settings_ui(
-                    self.printing_selected_speed_type,
-                    self.printing_target_speeds[self.printing_selected_speed_type],
-                )
+        handler = self._action_handlers.get(action)
+        if handler is not None:
+            handler()
+            return
+        # Prefix handlers receive whatever follows their prefix
+        for prefix, handler in self._action_prefix_handlers:
+            if action.startswith(prefix):
+                handler(action[len(prefix):])
+                return
+
+    def _action_move(self, arg):
+        axis, _, direction = arg.partition("_")
+        self.move_axis(axis.upper(), direction + self.move_distance)
+
+    def _action_set_distance(self, distance):
+        self.move_distance = distance
+        self._spawn(
+            self.display.update_prepare_move_ui(self.move_distance)
+        )
+
+    def _action_zoffset(self, direction):
+        self.send_gcode(
+            f"SET_GCODE_OFFSET Z_ADJUST={direction}{self.z_offset_distance} MOVE=1"
+        )
+
+    def _action_zoffsetchange(self, distance):
+        self.z_offset_distance = distance
+        self._spawn(
+            self.display.update_printing_zoffset_increment_ui(
+                self.z_offset_distance
             )
-        elif action.startswith("speed_increment_"):
-            parts = action.split("_")
-            self.printing_selected_speed_increment = parts[2]
-            self._loop.create_task(
-                self.display.update_printing_speed_increment_ui(
-                    self.printing_selected_speed_increment
-                )
+        )
+
+    def _action_toggle_part_light(self):
+        self.part_light_state = not self.part_light_state
+        self._set_light("Part_Light", self.part_light_state)
+
+    def _action_toggle_frame_light(self):
+        self.frame_light_state = not self.frame_light_state
+        self._set_light("Frame_Light", self.frame_light_state)
+
+    def _action_toggle_filament_sensor(self):
+        self.filament_sensor_state = not self.filament_sensor_state
+        self._toggle_filament_sensor(self.filament_sensor_state)
+
+    def _action_toggle_fan(self):
+        self.fan_state = not self.fan_state
+        self._toggle_fan(self.fan_state)
+
+    def _action_send_gcode(self, arg):
+        self.send_gcode(arg.split("'")[1])
+
+    def _action_page(self, page):
+        self._spawn(self._navigate_to_page(page))
+
+    def _action_emergency_stop(self):
+        logger.info("Executing emergency stop!")
+        self._spawn(
+            self._send_moonraker_request("printer.emergency_stop")
+        )
+
+    def _action_pause_print_button(self):
+        self._spawn(self._handle_pause_resume())
+
+    def _action_pause_print_confirm(self):
+        self._spawn(self._handle_pause_confirm())
+
+    def _action_stop_print(self):
+        logger.info("Stopping print")
+        self._spawn(self._send_request_behind_loading("printer.print.cancel"))
+
+    def _action_files_picker(self):
+        self._spawn(self._navigate_to_page(PAGE_FILES))
+        self._spawn(self._load_files())
+
+    def _action_temp_heater(self, heater):
+        self.printing_selected_heater = heater
+        self._spawn(
+            self.display.update_printing_heater_settings_ui(
+                self.printing_selected_heater,
+                self.printing_target_temps[self.printing_selected_heater],
             )
-        elif action.startswith("speed_adjust_"):
-            parts = action.split("_")
-            direction = parts[2]
-            current_speed = self.printing_target_speeds[
-                self.printing_selected_speed_type
-            ]
-            change = int(self.printing_selected_speed_increment) * (
-                1 if direction == "+" else -1
+        )
+
+    def _action_temp_increment(self, increment):
+        self.printing_selected_temp_increment = increment
+        self._spawn(
+            self.display.update_printing_temperature_increment_ui(
+                self.printing_selected_temp_increment
             )
-            self.send_speed_update(
+        )
+
+    def _action_temp_adjust(self, direction):
+        current_temp = self.printing_target_temps[self.printing_selected_heater]
+        new_target = current_temp + int(
+            self.printing_selected_temp_increment
+        ) * ADJUST_SIGN.get(direction, -1)
+        self.send_gcode(
+            f"SET_HEATER_TEMPERATURE HEATER={self.printing_selected_heater} TARGET={new_target}"
+        )
+
+    def _action_temp_reset(self):
+        self.send_gcode(
+            f"SET_HEATER_TEMPERATURE HEATER={self.printing_selected_heater} TARGET=0"
+        )
+
+    def _action_speed_type(self, speed_type):
+        self.printing_selected_speed_type = speed_type
+        self._spawn(
+            self.display.update_printing_speed_settings_ui(
                 self.printing_selected_speed_type,
-                (current_speed + (change / 100.0)) * 100,
-            )
-        elif action == "speed_reset":
-            self.send_speed_update(self.printing_selected_speed_type, 1.0)
-        elif action.startswith("files_page_"):
-            parts = action.split("_")
-            direction = parts[2]
-            self.files_page = int(
-                max(
-                    0,
-                    min(
-                        (len(self.dir_contents) / 5),
-                        self.files_page + (1 if direction == "next" else -1),
-                    ),
-                )
-            )
-            self._loop.create_task(
-            self.display.show_files_page(self.current_dir, self.dir_contents, self.files_page)
+                self.printing_target_speeds[self.printing_selected_speed_type],
             )
-        elif action.startswith("open_file_"):
-            parts = action.split("_")
-            index = int(parts[2])
-            selected = self.dir_contents[(self.files_page * 5) + index]
-            if selected["type"] == "dir":
-                self.current_dir = selected["path"]
-                self.files_page = 0
-                self._loop.create_task(self._load_files())
-            else:
-                self.current_filename = selected["path"]
-                self._loop.create_task(self._navigate_to_page(PAGE_CONFIRM_PRINT))
-        elif action == "print_opened_file":
-            self._go_back()
-            self._loop.create_task(self._navigate_to_page(PAGE_OVERLAY_LOADING))
-            self._loop.create_task(
-                self._send_moonraker_request(
-                    "printer.print.start", {"filename": self.current_filename}
-                )
+        )
+
+    def _action_speed_increment(self, increment):
+        self.printing_selected_speed_increment = increment
+        self._spawn(
+            self.display.update_printing_speed_increment_ui(
+                self.printing_selected_speed_increment
             )
-        elif action == "confirm_complete":
-            logger.info("Clearing SD Card")
-            self.send_gcode("SDCARD_RESET_FILE")
-        elif action.startswith("set_temp"):
-            parts = action.split("_")
-            target = parts[-1]
-            heater = "_".join(parts[2:-1])
-            self.send_gcode(
-                "SET_HEATER_TEMPERATURE HEATER=" + heater + " TARGET=" + target
+        )
+
+    def _action_speed_adjust(self, direction):
+        current_speed = self.printing_target_speeds[
+            self.printing_selected_speed_type
+        ]
+        change = int(self.printing_selected_speed_increment) * ADJUST_SIGN.get(
+            direction, -1
+        )
+        self.send_speed_update(
+            self.printing_selected_speed_type,
+            (current_speed + (change / 100.0)) * 100,
+        )
+
+    def _action_speed_reset(self):
+        self.send_speed_update(self.printing_selected_speed_type, 1.0)
+
+    def _action_files_page(self, direction):
+        self.files_page = int(
+            max(
+                0,
+                min(
+                    (len(self.dir_contents) / 5),
+                    self.files_page + (1 if direction == "next" else -1),
+                ),
             )
-        elif action.startswith("set_preset_temp"):
-            parts = action.split("_")
-            material = parts[3].lower()
+        )
+        self._spawn(
+            self.display.show_files_page(self.current_dir, self.dir_contents, self.files_page)
+        )
 
-            if "temperatures." + material in self.config:
-                extruder = self.config["temperatures." + material]["extruder"]
-                heater_bed = self.config["temperatures." + material]["heater_bed"]
-            else:
-                extruder = TEMP_DEFAULTS[material][0]
-                heater_bed = TEMP_DEFAULTS[material][1]
-            gcodes = [
-                f"SET_HEATER_TEMPERATURE HEATER=extruder TARGET={extruder}",
-                f"SET_HEATER_TEMPERATURE HEATER=heater_bed TARGET={heater_bed}",
-            ]
-            if self.display.model == MODEL_N4_PRO:
-                gcodes.append(
-                    f"SET_HEATER_TEMPERATURE HEATER=heater_bed_outer TARGET={heater_bed}"
-                )
-            self._loop.create_task(self.send_gcodes_async(gcodes))
-        elif action.startswith("set_extrude_amount"):
-            self.extrude_amount = int(action.split("_")[3])
-            self._loop.create_task(
-                self.display.update_prepare_extrude_ui(self.extrude_amount, self.extrude_speed)
+    def _action_open_file(self, index):
+        selected = self.dir_contents[(self.files_page * 5) + int(index)]
+        if selected["type"] == "dir":
+            self.current_dir = selected["path"]
+            self.files_page = 0
+            self._spawn(self._load_files())
+        else:
+            self.current_filename = selected["path"]
+            self._spawn(self._navigate_to_page(PAGE_CONFIRM_PRINT))
+
+    def _action_print_opened_file(self):
+        self._spawn(
+            self._send_request_behind_loading(
+                "printer.print.start", {"filename": self.current_filename}
             )
-        elif action.startswith("set_extrude_speed"):
-            self.extrude_speed = int(action.split("_")[3])
-            self._loop.create_task(
-                self.display.update_prepare_extrude_ui(self.extrude_amount, self.extrude_speed)
+        )
+
+    def _action_confirm_complete(self):
+        logger.info("Clearing SD Card")
+        self.send_gcode("SDCARD_RESET_FILE")
+
+    def _action_set_temp(self, arg):
+        heater, _, target = arg.rpartition("_")
+        self.send_gcode(f"SET_HEATER_TEMPERATURE HEATER={heater} TARGET={target}")
+
+    def _action_set_preset_temp(self, material):
+        material = material.lower()
+
+        preset = self.config.get_section(f"temperatures.{material}")
+        if preset is not None:
+            extruder = preset["extruder"]
+            heater_bed = preset["heater_bed"]
+        else:
+            extruder = TEMP_DEFAULTS[material][0]
+            heater_bed = TEMP_DEFAULTS[material][1]
+        gcodes = [
+            f"SET_HEATER_TEMPERATURE HEATER=extruder TARGET={extruder}",
+            f"SET_HEATER_TEMPERATURE HEATER=heater_bed TARGET={heater_bed}",
+        ]
+        if self.display.model == MODEL_N4_PRO:
+            gcodes.append(
+                f"SET_HEATER_TEMPERATURE HEATER=heater_bed_outer TARGET={heater_bed}"
             )
-        elif action.startswith("extrude_"):
-            parts = action.split("_")
-            direction = parts[1]
-            target_temp = 200
-            # Send GCODE commands in sequence:
-            gcode_sequence = f"""
-            M83
-            SET_HEATER_TEMPERATURE HEATER=extruder TARGET={target_temp}
-            TEMPERATURE_WAIT SENSOR=extruder MINIMUM={target_temp - 4} MAXIMUM={target_temp + 40}
-            G1 E{direction}{self.extrude_amount} F{self.extrude_speed}
-            """
-            # Send the full GCODE sequence
-            self._loop.create_task(self.send_gcodes_async(gcode_sequence.strip().split('\n')))
-        elif action.startswith("start_temp_preset_"):
-            material = action.split("_")[3]
-            self.temperature_preset_material = material
-            if "temperatures." + material in self.config:
-                self.temperature_preset_extruder = int(
-                    self.config["temperatures." + material]["extruder"]
-                )
-                self.temperature_preset_bed = int(
-                    self.config["temperatures." + material]["heater_bed"]
-                )
-            else:
-                self.temperature_preset_extruder = TEMP_DEFAULTS[material][0]
-                self.temperature_preset_bed = TEMP_DEFAULTS[material][1]
-            self._loop.create_task(self._navigate_to_page(PAGE_SETTINGS_TEMPERATURE_SET))
-        elif action.startswith("preset_temp_step_"):
-            size = int(action.split("_")[3])
-            self.temperature_preset_step = size
-        elif action.startswith("preset_temp_"):
-            parts = action.split("_")
-            heater = parts[2]
-            change = (
-                self.temperature_preset_step
-                if parts[3] == "up"
-                else -self.temperature_preset_step
+        self._spawn(self.send_gcodes_async(gcodes))
+
+    def _action_set_extrude_amount(self, amount):
+        self.extrude_amount = int(amount)
+        self._spawn(
+            self.display.update_prepare_extrude_ui(self.extrude_amount, self.extrude_speed)
+        )
+
+    def _action_set_extrude_speed(self, speed):
+        self.extrude_speed = int(speed)
+        self._spawn(
+            self.display.update_prepare_extrude_ui(self.extrude_amount, self.extrude_speed)
+        )
+
+    def _action_extrude(self, direction):
+        if self.current_state == "printing":
+            logger.info("Ignoring manual extrude while printing")
+            return
+        target_temp = 200
+        self._spawn(
+            self.send_gcodes_async(
+                [
+                    "M83",
+                    f"SET_HEATER_TEMPERATURE HEATER=extruder TARGET={target_temp}",
+                    f"TEMPERATURE_WAIT SENSOR=extruder MINIMUM={target_temp - 4} MAXIMUM={target_temp + 40}",
+                    f"G1 E{direction}{self.extrude_amount} F{self.extrude_speed}",
+                ]
             )
-            if heater == "extruder":
-                self.temperature_preset_extruder += change
-            else:
-                self.temperature_preset_bed += change
-            self._loop.create_task(
-                self.display.update_preset_temp_ui(
-                    self.temperature_preset_step,
-                    self.temperature_preset_extruder,
-                    self.temperature_preset_bed,
-                )
+        )
+
+    def _action_start_temp_preset(self, material):
+        self.temperature_preset_material = material
+        preset = self.config.get_section(f"temperatures.{material}")
+        if preset is not None:
+            self.temperature_preset_extruder = int(preset["extruder"])
+            self.temperature_preset_bed = int(preset["heater_bed"])
+        else:
+            self.temperature_preset_extruder = TEMP_DEFAULTS[material][0]
+            self.temperature_preset_bed = TEMP_DEFAULTS[material][1]
+        self._spawn(self._navigate_to_page(PAGE_SETTINGS_TEMPERATURE_SET))
+
+    def _action_preset_temp_step(self, step):
+        self.temperature_preset_step = int(step)
+
+    def _action_preset_temp(self, arg):
+        heater, _, direction = arg.partition("_")
+        change = (
+            self.temperature_preset_step
+            if direction == "up"
+            else -self.temperature_preset_step
+        )
+        if heater == "extruder":
+            self.temperature_preset_extruder += change
+        else:
+            self.temperature_preset_bed += change
+        self._spawn(
+            self.display.update_preset_temp_ui(
+                self.temperature_preset_step,
+                self.temperature_preset_extruder,
+                self.temperature_preset_bed,
             )
-        elif action == "save_temp_preset":
-            logger.info("Saving temp preset")
-            self.save_temp_preset()
-        elif action == "retry_screw_leveling":
-            self._loop.create_task(self.display.draw_initial_screw_leveling())
-            self._loop.create_task(self.handle_screw_leveling())
-        elif action == "begin_full_bed_level":
-            self.leveling_mode = "full_bed"
-            self._loop.create_task(self._navigate_to_page(PAGE_PRINTING_KAMP))
-            self.send_gcode("AUTO_FULL_BED_LEVEL")
-        elif action.startswith("zprobe_step_"):
-            parts = action.split("_")
-            self.z_probe_step = parts[2]
-            self._loop.create_task(
-                self.display.update_zprobe_leveling_ui(
-                    self.z_probe_step, self.z_probe_distance
-                )
+        )
+
+    def _action_save_temp_preset(self):
+        logger.info("Saving temp preset")
+        self.save_temp_preset()
+
+    def _action_retry_screw_leveling(self):
+        self._spawn(self.display.draw_initial_screw_leveling())
+        self._spawn(self.handle_screw_leveling())
+
+    def _action_begin_full_bed_level(self):
+        self.leveling_mode = "full_bed"
+        self._spawn(self._navigate_to_page(PAGE_PRINTING_KAMP))
+        self.send_gcode("AUTO_FULL_BED_LEVEL")
+
+    def _action_zprobe_step(self, step):
+        self.z_probe_step = step
+        self._spawn(
+            self.display.update_zprobe_leveling_ui(
+                self.z_probe_step, self.z_probe_distance
             )
-        elif action.startswith("zprobe_"):
-            parts = action.split("_")
-            direction = parts[1]
-            self.send_gcode(f"TESTZ Z={direction}{self.z_probe_step}")
-        elif action == "abort_zprobe":
-            self.send_gcode("ABORT")
-            self._go_back()
-        elif action == "save_zprobe":
-            self.send_gcode("ACCEPT")
-            self.send_gcode("SAVE_CONFIG")
-            self._go_back()
-        elif action == "save_config":
-            self.send_gcode("SAVE_CONFIG")
-            self._go_back()
-        elif action.startswith("set_speed_"):
-            parts = action.split("_")
-            speed = int(parts[2])
-            self.send_speed_update("print", speed)
-        elif action.startswith("set_flow_"):
-            parts = action.split("_")
-            speed = int(parts[2])
-            self.send_speed_update("flow", speed)
-        elif action == "reboot_host":
-            logger.info("Rebooting Host")
-            self._go_back()
-            self._loop.create_task(self._navigate_to_page(PAGE_OVERLAY_LOADING))
-            self._loop.create_task(self._send_moonraker_request("machine.reboot"))
-        elif action == "shutdown_host":
-            logger.info("Shutting down Host")
-            self._loop.create_task(self.run_shutdown_sequence())
-        elif action == "reboot_klipper":
-            logger.info("Rebooting Klipper")
-            self._loop.create_task(
-                self._send_moonraker_request(
-                    "machine.services.restart", {"service": "klipper"}
-                )
+        )
+
+    def _action_zprobe(self, direction):
+        self.send_gcode(f"TESTZ Z={direction}{self.z_probe_step}")
+
+    def _action_abort_zprobe(self):
+        self.send_gcode("ABORT")
+        self._go_back()
+
+    def _action_save_zprobe(self):
+        self.send_gcode("ACCEPT\nSAVE_CONFIG")
+        self._go_back()
+
+    def _action_save_config(self):
+        self.send_gcode("SAVE_CONFIG")
+        self._go_back()
+
+    def _action_set_speed(self, speed):
+        self.send_speed_update("print", int(speed))
+
+    def _action_set_flow(self, flow):
+        self.send_speed_update("flow", int(flow))
+
+    def _action_reboot_host(self):
+        logger.info("Rebooting Host")
+        self._spawn(self._send_request_behind_loading("machine.reboot"))
+
+    def _action_shutdown_host(self):
+        logger.info("Shutting down Host")
+        self._spawn(self.run_shutdown_sequence())
+
+    def _action_reboot_klipper(self):
+        logger.info("Rebooting Klipper")
+        self._spawn(
+            self._send_request_behind_loading(
+                "machine.services.restart", {"service": "klipper"}
             )
-            self._go_back()
-            self._loop.create_task(self._navigate_to_page(PAGE_OVERLAY_LOADING))
-        elif action == "firmware_restart":
-            logger.info("Firmware Restart")
-            self._loop.create_task(self._send_moonraker_request("printer.firmware_restart"))
-            self._go_back()
-            self._loop.create_task(self._navigate_to_page(PAGE_OVERLAY_LOADING))
+        )
+
+    def _action_firmware_restart(self):
+        logger.info("Firmware Restart")
+        self._spawn(self._send_request_behind_loading("printer.firmware_restart"))
+
+    async def _send_request_behind_loading(self, method, params=None):
+        # Leave the dialog and show the loading overlay before sending the
+        # request. The page behind the dialog is only taken off the history, as
+        # the overlay covers it straight away, showing it from a separate task
+        # would land after the overlay. A failing display must not keep the
+        # request from going out.
+        try:
+            if len(self.history) > 1:
+                self._pop_history()
+            await self._navigate_to_page(PAGE_OVERLAY_LOADING)
+        finally:
+            await self._send_moonraker_request(method, params)
 
     async def _handle_pause_resume(self):
         if self.current_state == "paused":
@@ -705,18 +917,11 @@ class DisplayController:
         self.send_gcode(gcode)
 
     def save_temp_preset(self):
-        if "temperatures." + self.temperature_preset_material not in self.config:
-            self.config["temperatures." + self.temperature_preset_material] = {}
-        self.config.set(
-            "temperatures." + self.temperature_preset_material,
-            "extruder",
-            str(self.temperature_preset_extruder),
-        )
-        self.config.set(
-            "temperatures." + self.temperature_preset_material,
-            "heater_bed",
-            str(self.temperature_preset_bed),
-        )
+        section = f"temperatures.{self.temperature_preset_material}"
+        if section not in self.config:
+            self.config[section] = {}
+        self.config.set(section, "extruder", str(self.temperature_preset_extruder))
+        self.config.set(section, "heater_bed", str(self.temperature_preset_bed))
         self.config.write_changes()
         self._go_back()
 
@@ -744,12 +949,9 @@ class DisplayController:
         self.send_gcode(gcode)
 
     def _build_path(self, *components):
-        path = ""
-        for component in components:
-            if component is None or component == "" or component == "/":
-                continue
-            path += f"/{component}"
-        return path[1:]
+        return "/".join(
+            component for component in components if component and component != "/"
+        )
 
     def sort_dir_contents(self, dir_contents):
         key = "modified"
@@ -760,7 +962,7 @@ class DisplayController:
                 key = files_config["sort_by"]
             if "sort_order" in files_config:
                 reverse = files_config["sort_order"] == "desc"
-        return sorted(dir_contents, key=lambda k: k[key], reverse=reverse)
+        return sorted(dir_contents, key=itemgetter(key), reverse=reverse)
 
     async def _load_files(self):
         data = await self._send_moonraker_request(
@@ -769,33 +971,40 @@ class DisplayController:
         )
         dir_info = data["result"]
         self.dir_contents = []
+        current_dir = self.current_dir
+        format_filename = build_format_filename()
+        files_config = self.config.get_section("files")
         dirs = []
+        dirs_append = dirs.append
         for item in dir_info["dirs"]:
-            if not item["dirname"].startswith("."):
-                dirs.append(
+            name = item["dirname"]
+            if name[:1] != ".":
+                dirs_append(
                     {
                         "type": "dir",
-                        "path": self._build_path(self.current_dir, item["dirname"]),
+                        "path": self._build_path(current_dir, name),
                         "size": item["size"],
                         "modified": item["modified"],
-                        "name": item["dirname"],
+                        "name": name,
                     }
                 )
         files = []
+        files_append = files.append
         for item in dir_info["files"]:
-            if item["filename"].endswith(".gcode"):
-                files.append(
+            name = item["filename"]
+            if name.endswith(GCODE_EXTENSIONS):
+                files_append(
                     {
                         "type": "file",
-                        "path": self._build_path(self.current_dir, item["filename"]),
+                        "path": self._build_path(current_dir, name),
                         "size": item["size"],
                         "modified": item["modified"],
-                        "name": build_format_filename()(item["filename"]),
+                        "name": format_filename(name),
                     }
                 )
         sort_folders_first = True
-        if "files" in self.config:
-            sort_folders_first = self.config["files"].getboolean(
+        if files_config is not None:
+            sort_folders_first = files_config.getboolean(
                 "sort_folders_first", fallback=True
             )
         if sort_folders_first:
@@ -809,34 +1018,45 @@ class DisplayController:
         )
 
     def _page_id(self, page):
-        return self.display.mapper.map_page(page)
+        try:
+            return self._page_map_cache[page]
+        except KeyError:
+            page_id = self._page_map_cache[page] = self.display.mapper.map_page(page)
+            return page_id
 
     def _go_back(self):
         if len(self.history) > 1:
             if self._get_current_page() == PAGE_FILES and self.current_dir != "":
                 self.current_dir = "/".join(self.current_dir.split("/")[:-1])
                 self.files_page = 0
-                self._loop.create_task(self._load_files())
+                self._spawn(self._load_files())
                 return
-            self.history.pop()
-            while len(self.history) > 1 and self.history[-1] in TRANSITION_PAGES:
-                self.history.pop()
-            back_page = self.history[-1]
-            self._loop.create_task(
-                self.display.navigate_to(self.display.mapper.map_page(back_page))
-            )
-            logger.debug(f"Navigating back to {back_page}")
-            self._loop.create_task(self.special_page_handling(back_page))
+            back_page = self._pop_history()
+            logger.debug("Navigating back to %s", back_page)
+            self._spawn(self._show_page(back_page))
         else:
             logger.debug("Already at the main page.")
 
+    def _pop_history(self):
+        self.history.pop()
+        while len(self.history) > 1 and self.history[-1] in TRANSITION_PAGES:
+            self.history.pop()
+        return self.history[-1]
+
+    async def _show_page(self, page):
+        # Page specific updates must only be written once the page is shown
+        await self.display.navigate_to(self._page_id(page))
+        await self.special_page_handling(page)
+
     def start_listening(self):
-        self._loop.create_task(self.listen())
+        self._spawn(self.listen())
 
     async def listen(self):
         await self.display.connect()
         await self.display.check_valid_version()
         await self.connect_moonraker()
+        # The sensor name may have changed with a config reload
+        self._build_status_handlers()
         ret = await self._send_moonraker_request(
             "printer.objects.subscribe",
             {
@@ -863,47 +1083,67 @@ class DisplayController:
             },
         )
         data = ret["result"]["status"]
-        logger.info("Display Type: " + str(self.display.get_display_type_name()))
-        logger.info("Printer Model: " + str(self.display.get_device_name()))
+        logger.info("Display Type: %s", self.display.get_display_type_name())
+        logger.info("Printer Model: %s", self.display.get_device_name())
         await self.display.initialize_display()
         await self.handle_status_update(data)
 
-    async def _send_moonraker_request(self, method, params=None):
-        if params is None:
-            params = {}
-        message = self._make_rpc_msg(method, **params)
+    def _prepare_moonraker_request(self, method, params=None):
         fut = self._loop.create_future()
-        self.pending_reqs[message["id"]] = fut
-        data = json.dumps(message).encode() + b"\x03"
+        uid = self._next_rpc_id
+        self._next_rpc_id += 1
+        self.pending_reqs[uid] = fut
+        items = tuple(params.items()) if params else ()
+        try:
+            template = _encode_rpc_template(method, items)
+        except TypeError:
+            # Nested params (e.g. subscriptions) are not hashable, skip the cache
+            template = _encode_rpc_template.__wrapped__(method, items)
+        return fut, template.replace(_RPC_ID_TOKEN, str(uid).encode(), 1)
+
+    def _queue_write(self, data):
+        # Everything queued during one loop iteration goes out in a single write
+        if not self._write_buffer:
+            self._loop.call_soon(self._flush_writes)
+        self._write_buffer += data
+
+    def _flush_writes(self):
+        # Hand the filled buffer to the transport and start a fresh one rather
+        # than copying it out
+        data, self._write_buffer = self._write_buffer, bytearray()
         try:
             self.writer.write(data)
-            await self.writer.drain()
-        except asyncio.CancelledError:
-            raise
-        except Exception:
-            await self.close()
+        except Exception as e:
+            logger.error("Failed to write to Moonraker: %s", e)
+            self._spawn(self.close())
+
+    async def _send_moonraker_request(self, method, params=None):
+        fut, data = self._prepare_moonraker_request(method, params)
+        # No drain here: the write only reaches the transport once the queue
+        # is flushed, and every caller already waits for its reply. A dropped
+        # socket is noticed and closed by _process_stream.
+        self._queue_write(data)
         return await fut
 
     def _find_ips(self, network):
-        ips = []
-        for key in network:
-            if "ip_addresses" in network[key]:
-                for ip in network[key]["ip_addresses"]:
-                    if ip["family"] == "ipv4":
-                        ips.append(ip["address"])
-        return ips
+        return [
+            ip["address"]
+            for interface in network.values()
+            for ip in interface.get("ip_addresses", ())
+            if ip["family"] == "ipv4"
+        ]
 
     async def connect_moonraker(self) -> None:
         sockfile = os.path.expanduser("~/printer_data/comms/moonraker.sock")
         sockpath = pathlib.Path(sockfile).expanduser().resolve()
-        logger.info(f"Connecting to Moonraker at {sockpath}")
+        logger.info("Connecting to Moonraker at %s", sockpath)
         while True:
             try:
                 reader, writer = await asyncio.open_unix_connection(
                     sockpath, limit=SOCKET_LIMIT
                 )
                 self.writer = writer
-                self._loop.create_task(self._process_stream(reader))
+                self._spawn(self._process_stream(reader))
                 self.connected = True
                 logger.info("Connected to Moonraker")
 
@@ -918,7 +1158,7 @@ class DisplayController:
                         software_version.split("-")[:2]
                     )  # clean up version string
                     # Process the software_version...
-                    logger.info(f"Software Version: {software_version}")
+                    logger.info("Software Version: %s", software_version)
                     await self.display.update_klipper_version_ui(software_version)
                     break
 
@@ -932,7 +1172,7 @@ class DisplayController:
             except asyncio.CancelledError:
                 raise
             except Exception as e:
-                logger.error(f"Error connecting to Moonraker: {e}")
+                logger.error("Error connecting to Moonraker: %s", e)
                 await asyncio.sleep(5)  # Wait before reconnecting
                 continue
 
@@ -946,7 +1186,7 @@ class DisplayController:
             },
         )
         logger.debug(
-            f"Client Identified With Moonraker: {ret['result']['connection_id']}"
+            "Client Identified With Moonraker: %s", ret["result"]["connection_id"]
         )
 
         system = (await self._send_moonraker_request("machine.system_info"))["result"][
@@ -954,42 +1194,34 @@ class DisplayController:
         ]
         self.display.ips = ", ".join(self._find_ips(system["network"]))
 
-    def _make_rpc_msg(self, method: str, **kwargs):
-        msg = {"jsonrpc": "2.0", "method": method}
-        uid = id(msg)
-        msg["id"] = uid
-        self.pending_req = msg
-        if kwargs:
-            msg["params"] = kwargs
-        return msg
-
     def handle_response(self, page, component):
-        if page in response_actions:
-            if component in response_actions[page]:
-                self.execute_action(response_actions[page][component])
-                return
+        page_actions = response_actions.get(page)
+        if page_actions is not None and component in page_actions:
+            self.execute_action(page_actions[component])
+            return
         if component == 0:
             self._go_back()
             return
-        logger.info(f"Unhandled Response: {page} {component}")
+        logger.info("Unhandled Response: %s %s", page, component)
 
     def handle_input(self, page, component, value):
-        if page in input_actions:
-            if component in input_actions[page]:
-                self.execute_action(
-                    input_actions[page][component].replace("$", str(value))
-                )
-                return
-        logger.info(f"Unhandled Input: {page} {component} {value}")
+        page_actions = input_actions.get(page)
+        if page_actions is not None and component in page_actions:
+            action = page_actions[component]
+            if "$" in action:
+                action = action.replace("$", str(value))
+            self.execute_action(action)
+            return
+        logger.info("Unhandled Input: %s %s %s", page, component, value)
 
     def handle_custom_touch(self, x, y):
-        if self._get_current_page() in custom_touch_actions:
-            actions = custom_touch_actions[self._get_current_page()]
-            for key in actions:
-                min_x, min_y, max_x, max_y = key
-                if min_x < x and x < max_x and min_y < y and y < max_y:
-                    self.execute_action(actions[key])
-                    return
+        actions = custom_touch_actions.get(self._get_current_page())
+        if actions is None:
+            return
+        for (min_x, min_y, max_x, max_y), action in actions.items():
+            if min_x < x < max_x and min_y < y < max_y:
+                self.execute_action(action)
+                return
 
     async def display_event_handler(self, type, data):
         if type == EventType.TOUCH:
@@ -1003,11 +1235,11 @@ class DisplayController:
             self.handle_input(data.page_id, data.component_id, data.value)
         elif type == EventType.RECONNECTED:
             logger.info("Reconnected to Display")
-            self.history = []
+            self.history.clear()
             await self.display.initialize_display()
             await self._navigate_to_page(PAGE_MAIN, clear_history=True)
         else:
-            logger.info(f"Unhandled Event: {type} {data}")
+            logger.info("Unhandled Event: %s %s", type, data)
 
     async def _process_stream(self, reader: asyncio.StreamReader) -> None:
         errors_remaining: int = 10
@@ -1017,8 +1249,7 @@ class DisplayController:
                 self.klipper_restart_event.clear()
             try:
                 data = await reader.readuntil(b"\x03")
-                decoded = data[:-1].decode(encoding="utf-8")
-                item = json.loads(decoded)
+                item = json_loads(data[:-1])
             except (ConnectionError, asyncio.IncompleteReadError):
                 await self._attempt_reconnect()
                 break
@@ -1032,38 +1263,39 @@ class DisplayController:
             errors_remaining = 10
             if "id" in item:
                 fut = self.pending_reqs.pop(item["id"], None)
-                if fut is not None:
+                # The caller may have given up on the reply already
+                if fut is not None and not fut.done():
                     fut.set_result(item)
-            elif item["method"] == "notify_status_update":
-                await self.handle_status_update(item["params"][0])
-            elif item["method"] == "notify_gcode_response":
-                self.handle_gcode_response(item["params"][0])
+            else:
+                handler = self._notify_handlers.get(item.get("method"))
+                if handler is not None:
+                    # Status updates are awaited in order, gcode responses are
+                    # handled synchronously
+                    result = handler(item["params"][0])
+                    if result is not None:
+                        await result
         logger.info("Unix Socket Disconnection from _process_stream()")
         await self.close()
 
     def handle_machine_config_change(self, new_data):
-        max_x, max_y, max_z = 0, 0, 0
-        if "config" in new_data:
-            if "stepper_x" in new_data["config"]:
-                if "position_max" in new_data["config"]["stepper_x"]:
-                    max_x = int(new_data["config"]["stepper_x"]["position_max"])
-            if "stepper_y" in new_data["config"]:
-                if "position_max" in new_data["config"]["stepper_x"]:
-                    max_y = int(new_data["config"]["stepper_y"]["position_max"])
-            if "stepper_z" in new_data["config"]:
-                if "position_max" in new_data["config"]["stepper_x"]:
-                    max_z = int(new_data["config"]["stepper_z"]["position_max"])
-
-            if max_x > 0 and max_y > 0 and max_z > 0:
-                logger.info(f"Machine Size: {max_x}x{max_y}x{max_z}")
-                self._loop.create_task(
-                    self.display.update_machine_size_ui(max_x, max_y, max_z)
-                )
-            if "bed_mesh" in new_data["config"]:
-                if "probe_count" in new_data["config"]["bed_mesh"]:
-                    parts = new_data["config"]["bed_mesh"]["probe_count"].split(",")
-                    self.full_bed_leveling_counts = [int(parts[0]), int(parts[1])]
-                    self.bed_leveling_counts = self.full_bed_leveling_counts
+        config = new_data.get("config")
+        if not config:
+            return
+        max_x, max_y, max_z = (
+            _config_int(config.get(stepper, {}).get("position_max", 0))
+            for stepper in ("stepper_x", "stepper_y", "stepper_z")
+        )
+
+        if max_x > 0 and max_y > 0 and max_z > 0:
+            logger.info("Machine Size: %sx%sx%s", max_x, max_y, max_z)
+            self._spawn_display(
+                self.display.update_machine_size_ui(max_x, max_y, max_z)
+            )
+        probe_count = config.get("bed_mesh", {}).get("probe_count")
+        if probe_count:
+            parts = probe_count.split(",")
+            self.full_bed_leveling_counts = [_config_int(parts[0]), _config_int(parts[1])]
+            self.bed_leveling_counts = self.full_bed_leveling_counts
 
     async def _attempt_reconnect(self):
         logger.info("Attempting to reconnect to Moonraker...")
@@ -1089,20 +1321,32 @@ class DisplayController:
         return metadata["result"]
 
     async def load_thumbnail_for_page(self, filename, page_number, metadata=None):
-        logger.info("Loading thumbnail for " + filename)
+        logger.info("Loading thumbnail for %s", filename)
+        # A newer load supersedes this one, checked after every await
+        self._thumbnail_gen += 1
+        gen = self._thumbnail_gen
+        if self._thumbnail_fetch is not None:
+            # Abort the download of the load we supersede, a decode already
+            # running in the executor still finishes but its result is dropped
+            self._thumbnail_fetch.cancel()
 
         if metadata is None:
             metadata = await self.load_metadata(filename)
-        
+            if gen != self._thumbnail_gen:
+                return
+
         best_thumbnail = self.find_best_thumbnail(metadata)
         if not best_thumbnail:
-            logger.warning(f"No suitable thumbnail found for {filename}")
+            logger.warning("No suitable thumbnail found for %s", filename)
             if self._get_current_page() == page_number:
                 await self.display.hide_thumbnail()
             return
 
         path = self.construct_thumbnail_path(filename, best_thumbnail["relative_path"])
-        image = await self.fetch_and_parse_thumbnail(path)
+        image = await self._get_thumbnail(path, metadata.get("modified"), filename, gen)
+        if gen != self._thumbnail_gen:
+            logger.info("Dropping outdated thumbnail for %s", filename)
+            return
 
         if image is None:
             await self.display.hide_thumbnail()
@@ -1112,69 +1356,110 @@ class DisplayController:
         await self.display.display_thumbnail(page_number, image)
         logger.info("Thumbnail displayed successfully")
 
+    async def _get_thumbnail(self, path, modified, filename, gen):
+        # Reopening a file or returning to the print page shows the same
+        # thumbnail again, reuse it while the gcode file is unchanged
+        cache_key = (path, modified)
+        image = self._thumbnail_cache.get(cache_key)
+        if image is not None:
+            self._thumbnail_cache.move_to_end(cache_key)
+            return image
+
+        fetch = self._spawn(self.fetch_and_parse_thumbnail(path))
+        self._thumbnail_fetch = fetch
+        try:
+            image = await fetch
+        except asyncio.CancelledError:
+            if gen == self._thumbnail_gen:
+                raise
+            logger.info("Cancelled outdated thumbnail fetch for %s", filename)
+            return None
+        finally:
+            if self._thumbnail_fetch is fetch:
+                self._thumbnail_fetch = None
+
+        if image is not None:
+            self._thumbnail_cache[cache_key] = image
+            if len(self._thumbnail_cache) > THUMBNAIL_CACHE_SIZE:
+                self._thumbnail_cache.popitem(last=False)
+        return image
+
     def find_best_thumbnail(self, metadata):
-        best_thumbnail = None
-        for thumbnail in metadata["thumbnails"]:
+        thumbnails = metadata.get("thumbnails") or ()
+        for thumbnail in thumbnails:
             if thumbnail["width"] == 160:
                 return thumbnail
-            if best_thumbnail is None or thumbnail["width"] > best_thumbnail["width"]:
-                best_thumbnail = thumbnail
-        return best_thumbnail
+        return max(thumbnails, key=itemgetter("width"), default=None)
 
     def construct_thumbnail_path(self, filename, relative_path):
-        path = "/".join(filename.split("/")[:-1])
-        if path != "":
-            path = path + "/"
-        return path + relative_path
+        directory = filename.rpartition("/")[0]
+        return f"{directory}/{relative_path}" if directory else relative_path
 
     async def fetch_and_parse_thumbnail(self, path):
         url = f"{self.config.safe_get('general', 'moonraker_url', 'http://localhost:7125')}/server/files/gcodes/{self.pathname2url(path)}"
         try:
-            logger.info(f"Fetching thumbnail image from {url}")
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=5) as resp:
-                    if resp.status != 200:
-                        raise aiohttp.ClientError(f"Failed to fetch thumbnail, status code: {resp.status}")
-                    img_data = await resp.read()
+            logger.info("Fetching thumbnail image from %s", url)
+            session = self._get_http_session()
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    raise aiohttp.ClientError(f"Failed to fetch thumbnail, status code: {resp.status}")
+                # Thumbnails are a few KB, refuse anything that could exhaust
+                # memory before it is decoded
+                if (resp.content_length or 0) > MAX_THUMBNAIL_BYTES:
+                    raise aiohttp.ClientError(f"Thumbnail too large: {resp.content_length} bytes")
+                img_data = bytearray()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    img_data += chunk
+                    if len(img_data) > MAX_THUMBNAIL_BYTES:
+                        raise aiohttp.ClientError("Thumbnail too large")
             logger.info("Thumbnail image fetched successfully")
-            thumbnail = Image.open(io.BytesIO(img_data))
-            logger.info("Thumbnail image opened successfully")
-        except (aiohttp.ClientError, IOError) as e:
-            logger.error(f"Failed to fetch or open thumbnail image: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Failed to fetch thumbnail image: %s", e)
             return None
 
         try:
             background = self.config["thumbnails"].get("background_color", "29354a")
             logger.info("Starting thumbnail parsing")
-            loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor(max_workers=2) as pool:
-                image = await loop.run_in_executor(pool, parse_thumbnail, thumbnail, 160, 160, background)
+            image = await self._loop.run_in_executor(
+                self._get_thumbnail_executor(),
+                _decode_thumbnail,
+                img_data,
+                160,
+                160,
+                background,
+            )
             logger.info("Thumbnail parsing completed")
             return image
+        except BrokenProcessPool as e:
+            logger.error("Thumbnail worker died: %s", e)
+            self._thumbnail_executor = None
+            return None
         except Exception as e:
-            logger.error(f"Error in thumbnail parsing: {e}")
+            logger.error("Error in thumbnail parsing: %s", e)
             return None
 
     async def handle_status_update(self, new_data, data_mapping=None):
         if data_mapping is None:
             data_mapping = self.display.mapper.data_mapping
 
-        if "print_stats" in new_data:
-            filename = new_data["print_stats"].get("filename")
+        # Most updates during a print only carry positions and temperatures,
+        # they skip the print state handling entirely
+        print_stats = new_data.get("print_stats")
+        if print_stats is not None:
+            filename = print_stats.get("filename")
             if filename:
-                async with self._filename_lock:
-                    self.current_filename = filename
-                self._loop.create_task(
+                self.current_filename = filename
+                self._spawn(
                     self.load_thumbnail_for_page(self.current_filename, self._page_id(PAGE_PRINTING))
                 )
 
-            state = new_data["print_stats"].get("state")
+            state = print_stats.get("state")
             if state:
                 self.current_state = state
-                logger.info(f"Status Update: {state}")
+                logger.info("Status Update: %s", state)
                 current_page = self._get_current_page()
 
-                if state in ["printing", "paused"]:
+                if state in ("printing", "paused"):
                     await self.display.update_printing_state_ui(state)
                     if current_page is None or current_page not in PRINTING_PAGES:
                         await self._navigate_to_page(PAGE_PRINTING, clear_history=True)
@@ -1190,101 +1475,148 @@ class DisplayController:
                     ):
                         await self._navigate_to_page(PAGE_MAIN, clear_history=True)
 
-        if "print_duration" in new_data.get("print_stats", {}):
-            self.current_print_duration = new_data["print_stats"]["print_duration"]
-
-        progress = new_data.get("display_status", {}).get("progress", 0)
-        if progress > 0 and "print_duration" in new_data.get("print_stats", {}):
-            total_time = self.current_print_duration / progress
-            remaining_time = format_time(total_time - self.current_print_duration)
-            self._loop.create_task(self.display.update_time_remaining(remaining_time))
+            if "print_duration" in print_stats:
+                self.current_print_duration = print_stats["print_duration"]
+                progress = new_data.get("display_status", {}).get("progress", 0)
+                if progress > 0:
+                    total_time = self.current_print_duration / progress
+                    remaining_time = format_time(total_time - self.current_print_duration)
+                    self._spawn_display(self.display.update_time_remaining(remaining_time))
 
         self._update_misc_states(new_data, data_mapping)
 
+    def _build_status_handlers(self):
+        # Keyed by subscribed object, so each update only visits the objects
+        # it actually carries
+        self._status_handlers = {
+            "output_pin Part_Light": self._on_part_light_status,
+            "output_pin Frame_Light": self._on_frame_light_status,
+            "fan": self._on_fan_status,
+            f"filament_switch_sensor {self.filament_sensor_name}": self._on_filament_sensor_status,
+            "configfile": self.handle_machine_config_change,
+            "extruder": partial(self._on_heater_status, "extruder"),
+            "heater_bed": partial(self._on_heater_status, "heater_bed"),
+            "heater_generic heater_bed_outer": partial(
+                self._on_heater_status, "heater_bed_outer"
+            ),
+            "gcode_move": self._on_gcode_move_status,
+        }
+
     def _update_misc_states(self, new_data, data_mapping):
         # Handle other updates: lights, fans, filament sensor, etc.
-        if (
-            "output_pin Part_Light" in new_data
-            and new_data["output_pin Part_Light"]["value"] is not None
-        ):
-            self.part_light_state = int(new_data["output_pin Part_Light"]["value"]) == 1
-
-        if (
-            "output_pin Frame_Light" in new_data
-            and new_data["output_pin Frame_Light"]["value"] is not None
-        ):
-            self.frame_light_state = (
-                int(new_data["output_pin Frame_Light"]["value"]) == 1
-            )
-
-        if "fan" in new_data:
-            self.fan_state = float(new_data["fan"]["speed"]) > 0
-            self.printing_target_speeds["fan"] = float(new_data["fan"]["speed"])
-            self._loop.create_task(
+        handlers = self._status_handlers
+        for key, value in new_data.items():
+            handler = handlers.get(key)
+            if handler is not None:
+                handler(value)
+
+        # Fan, flow and speed changes in one update refresh the widget once
+        if self._speed_ui_pending:
+            self._speed_ui_pending = False
+            self._spawn_display(
                 self.display.update_printing_speed_settings_ui(
                     self.printing_selected_speed_type,
                     self.printing_target_speeds[self.printing_selected_speed_type],
                 )
             )
 
-        # Update other heating values, sensors, etc.
-        if f"filament_switch_sensor {self.filament_sensor_name}" in new_data:
-            sensor_data = new_data[f"filament_switch_sensor {self.filament_sensor_name}"]
-            self.filament_sensor_state = int(sensor_data.get("enabled", 0)) == 1
-
-        if "configfile" in new_data:
-            self.handle_machine_config_change(new_data["configfile"])
-
-        if "extruder" in new_data:
-            target = new_data["extruder"].get("target")
-            if target is not None:
-                self.printing_target_temps["extruder"] = target
-                self.printer_heating_value_changed("extruder", target)
-
-        if "heater_bed" in new_data:
-            target = new_data["heater_bed"].get("target")
-            if target is not None:
-                self.printing_target_temps["heater_bed"] = target
-                self.printer_heating_value_changed("heater_bed", target)
-
-        if "heater_generic heater_bed_outer" in new_data:
-            target = new_data["heater_generic heater_bed_outer"].get("target")
-            if target is not None:
-                self.printing_target_temps["heater_bed_outer"] = target
-                self.printer_heating_value_changed("heater_bed_outer", target)
-
-        if "gcode_move" in new_data:
-            extrude_factor = new_data["gcode_move"].get("extrude_factor")
-            if extrude_factor is not None:
-                self.printing_target_speeds["flow"] = float(extrude_factor)
-                self._loop.create_task(
-                    self.display.update_printing_speed_settings_ui(
-                        self.printing_selected_speed_type,
-                        self.printing_target_speeds[self.printing_selected_speed_type],
-                    )
-                )
+        self._spawn_display(self.display.update_data(new_data, data_mapping))
 
-            speed_factor = new_data["gcode_move"].get("speed_factor")
-            if speed_factor is not None:
-                self.printing_target_speeds["print"] = float(speed_factor)
-                self._loop.create_task(
-                    self.display.update_printing_speed_settings_ui(
-                        self.printing_selected_speed_type,
-                        self.printing_target_speeds[self.printing_selected_speed_type],
-                    )
-                )
+    def _on_part_light_status(self, data):
+        if data["value"] is not None:
+            self.part_light_state = int(data["value"]) == 1
+
+    def _on_frame_light_status(self, data):
+        if data["value"] is not None:
+            self.frame_light_state = int(data["value"]) == 1
+
+    def _on_fan_status(self, data):
+        self.fan_state = float(data["speed"]) > 0
+        self.printing_target_speeds["fan"] = float(data["speed"])
+        self._speed_ui_pending = True
+
+    def _on_filament_sensor_status(self, data):
+        self.filament_sensor_state = int(data.get("enabled", 0)) == 1
 
-        self._loop.create_task(self.display.update_data(new_data, data_mapping))
+    def _on_heater_status(self, heater, data):
+        target = data.get("target")
+        if target is not None:
+            self.printing_target_temps[heater] = target
+            self.printer_heating_value_changed(heater, target)
+
+    def _on_gcode_move_status(self, data):
+        extrude_factor = data.get("extrude_factor")
+        if extrude_factor is not None:
+            self.printing_target_speeds["flow"] = float(extrude_factor)
+            self._speed_ui_pending = True
+
+        speed_factor = data.get("speed_factor")
+        if speed_factor is not None:
+            self.printing_target_speeds["print"] = float(speed_factor)
+            self._speed_ui_pending = True
 
     def printer_heating_value_changed(self, heater, new_value):
             if heater == self.printing_selected_heater:
-                self._loop.create_task(
+                self._spawn_display(
                     self.display.update_printing_heater_settings_ui(
                         self.printing_selected_heater,
                         new_value,
                     )
                 )
 
+    def _get_http_session(self):
+        # One pooled session for the lifetime of the process, so repeated
+        # thumbnail fetches reuse the keep-alive connection to Moonraker.
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=4,
+                    keepalive_timeout=75,
+                    enable_cleanup_closed=True,
+                    # The Moonraker host rarely changes, keep lookups out of
+                    # the executor
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=THUMBNAIL_FETCH_TIMEOUT, connect=1, sock_read=2
+                ),
+            )
+        return self._http_session
+
+    def _get_thumbnail_executor(self):
+        # parse_thumbnail is mostly pure Python and holds the GIL, in a thread
+        # it stalls the Moonraker stream. Run it in one long-lived worker
+        # process instead, forked so this script is not imported again.
+        # Forking once threads exist can deadlock the child on a lock some
+        # other thread held, and it inherits every open descriptor, so
+        # start_thumbnail_executor() forks the worker at startup. Only a pool
+        # replaced after a crash is forked later, from the running process.
+        if self._thumbnail_executor is None:
+            # Ctrl-C reaches the whole process group, the worker is shut down
+            # by this process instead
+            self._thumbnail_executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=signal.signal,
+                initargs=(signal.SIGINT, signal.SIG_IGN),
+            )
+        return self._thumbnail_executor
+
+    def start_thumbnail_executor(self):
+        # The worker is forked on the first submit, give it a no-op while the
+        # process has no other threads and no sockets open
+        self._get_thumbnail_executor().submit(int)
+
+    def shutdown_thumbnail_executor(self):
+        if self._thumbnail_executor is not None:
+            self._thumbnail_executor.shutdown(wait=False, cancel_futures=True)
+            self._thumbnail_executor = None
+
+    async def close_http_session(self):
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+
     async def close(self):
         if not self.connected:
             return
@@ -1317,21 +1649,21 @@ class DisplayController:
         if self.leveling_mode == "screw":
             if "probe at" in response:
                 self.screw_probe_count += 1
-                self._loop.create_task(
+                self._spawn(
                     self.display.update_screw_level_description(
                         f"Probing Screws ({ceil(self.screw_probe_count/3)}/4)..."
                     )
                 )
-            if "screw (base) :" in response:
-                self.screw_levels[response.split("screw")[0][3:].strip()] = "base"
-            if "screw :" in response:
+            elif "screw (base) :" in response:
+                self.screw_levels[response.partition("screw")[0][3:].strip()] = "base"
+            elif "screw :" in response:
                 self.screw_levels[
-                    response.split("screw")[0][3:].strip()
-                ] = response.split("adjust")[1].strip()
+                    response.partition("screw")[0][3:].strip()
+                ] = response.partition("adjust")[2].strip()
         elif self.leveling_mode == "zprobe":
             if "Z position:" in response:
                 self.z_probe_distance = response.split("->")[1].split("<-")[0].strip()
-                self._loop.create_task(
+                self._spawn(
                     self.display.update_zprobe_leveling_ui(
                         self.z_probe_step, self.z_probe_distance
                     )
@@ -1344,7 +1676,7 @@ class DisplayController:
         elif response.startswith("// bed_mesh: generated points"):
             self.bed_leveling_probed_count = 0
             if self._get_current_page() != PAGE_PRINTING_KAMP:
-                self._loop.create_task(self._navigate_to_page(PAGE_PRINTING_KAMP))
+                self._spawn(self._navigate_to_page(PAGE_PRINTING_KAMP))
         elif response.startswith("// probe at "):
             if self._get_current_page() != PAGE_PRINTING_KAMP:
                 # We are not leveling, likely response came from manual probe e.g. from console,
@@ -1354,7 +1686,7 @@ class DisplayController:
             if self.bed_leveling_last_position != new_position:
                 self.bed_leveling_last_position = new_position
                 if self.bed_leveling_probed_count > 0:
-                    self._loop.create_task(
+                    self._spawn(
                         self.display.draw_kamp_box_index(
                             self.bed_leveling_probed_count - 1,
                             BACKGROUND_SUCCESS,
@@ -1362,14 +1694,14 @@ class DisplayController:
                         )
                     )
                 self.bed_leveling_probed_count += 1
-                self._loop.create_task(
+                self._spawn(
                     self.display.draw_kamp_box_index(
                         self.bed_leveling_probed_count - 1,
                         BACKGROUND_WARNING,
                         self.bed_leveling_counts,
                     )
                 )
-                self._loop.create_task(
+                self._spawn(
                     self.display.update_kamp_text(
                         f"Probing... ({self.bed_leveling_probed_count}/{self.bed_leveling_counts[0]*self.bed_leveling_counts[1]})"
                     )
@@ -1379,70 +1711,90 @@ class DisplayController:
             self.bed_leveling_counts = self.full_bed_leveling_counts
             if self._get_current_page() == PAGE_PRINTING_KAMP:
                 if self.leveling_mode == "full_bed":
-                    self._loop.create_task(self.display.show_bed_mesh_final())
+                    self._spawn(self.display.show_bed_mesh_final())
                 else:
                     self._go_back()
 
     async def run_shutdown_sequence(self):
         await self.display.show_shutdown_screens()
         await asyncio.sleep(1)
-        await self._send_moonraker_request("machine.shutdown")
+        # A hung Moonraker is a common reason to shut down, don't wait on it
+        # forever
+        try:
+            await asyncio.wait_for(
+                self._send_moonraker_request("machine.shutdown"),
+                SHUTDOWN_REQUEST_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Moonraker did not acknowledge the shutdown request")
 
 
-loop = asyncio.get_event_loop()
-config_observer = Observer()
+if __name__ == "__main__":
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="display")
+    )
+    fs_watcher = None
+    controller = None
 
-try:
-    config = ConfigHandler(config_file, logger)
+    try:
+        config = ConfigHandler(config_file, logger)
 
-    controller = DisplayController(config)
-    controller._loop = loop
+        controller = DisplayController(config)
+        controller._loop = loop
+        controller.start_thumbnail_executor()
 
-    def handle_wd_callback(notifier):
-        controller.handle_config_change()
+        def handle_wd_callback(name, mask):
+            controller.handle_config_change()
 
-    def handle_sock_changes(notifier):
-        if notifier.event_type == "created":
-            logger.info(
-                f"{notifier.src_path.split('/')[-1]} created. Attempting to reconnect..."
-            )
+        def handle_sock_changes(name, mask):
+            logger.info("%s created. Attempting to reconnect...", name)
             controller.klipper_restart_event.set()
 
-    config_patterns = ["display_connector.cfg"]
-    socket_patterns = ["klippy.sock", "moonraker.sock"]
-    
-    # Initialize the config event handler
-    config_event_handler = PatternMatchingEventHandler(
-        patterns=config_patterns, 
-        ignore_patterns=None, 
-        ignore_directories=True, 
-        case_sensitive=True
-    )
-    config_event_handler.on_modified = handle_wd_callback
-    config_event_handler.on_created = handle_wd_callback
-
-    # Initialize the socket event handler
-    socket_event_handler = PatternMatchingEventHandler(
-        patterns=socket_patterns, 
-        ignore_patterns=None, 
-        ignore_directories=True, 
-        case_sensitive=True
-    )
-    socket_event_handler.on_modified = handle_sock_changes
-    socket_event_handler.on_created = handle_sock_changes
-    socket_event_handler.on_deleted = handle_sock_changes
-
-    # Schedule the observers
-    config_observer.schedule(config_event_handler, config.file, recursive=False)
-    config_observer.schedule(socket_event_handler, comms_directory, recursive=False)
-    config_observer.start()
-
-    loop.call_later(1, controller.start_listening)
-    loop.run_forever()
-except Exception as e:
-    logger.error("Error communicating...: " + str(e))
-    logger.error(traceback.format_exc())
-finally:
-    config_observer.stop()
-    config_observer.join()
-    loop.close()
+        # Events are read on the loop itself, no observer thread involved. The
+        # directories are watched so files replaced by a rename are still seen,
+        # but only for the events acted upon: a finished write or a rename onto
+        # the config, and socket creation.
+        fs_watcher = InotifyWatcher(loop)
+        fs_watcher.watch(
+            os.path.dirname(config.file),
+            [os.path.basename(config.file)],
+            IN_CLOSE_WRITE | IN_MOVED_TO,
+            handle_wd_callback,
+        )
+        fs_watcher.watch(
+            comms_directory,
+            ["klippy.sock", "moonraker.sock"],
+            IN_CREATE,
+            handle_sock_changes,
+        )
+
+        loop.call_soon(controller.start_listening)
+        loop.run_forever()
+    except Exception as e:
+        logger.exception("Error communicating...: %s", e)
+    finally:
+        if fs_watcher is not None:
+            fs_watcher.close()
+        # Same teardown as asyncio.run(): cancel whatever is still running and
+        # let it unwind before closing resources under it
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            try:
+                loop.run_until_complete(
+                    asyncio.wait_for(
+                        asyncio.gather(*pending, return_exceptions=True),
+                        SHUTDOWN_TIMEOUT,
+                    )
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Tasks did not finish within %ss of shutdown", SHUTDOWN_TIMEOUT)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        if controller is not None:
+            loop.run_until_complete(controller.close_http_session())
+            controller.shutdown_thumbnail_executor()
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
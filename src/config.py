@@ -28,6 +28,11 @@ class ConfigHandler(ConfigParser):
         with open(self.file_path, "w") as configfile:
             self.write(configfile)
 
+    def get_section(self, section):
+        if self.has_section(section):
+            return self[section]
+        return None
+
     def safe_get(self, section, key, default=None):
         try:
             return self.get(section, key)
@@ -0,0 +1,75 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    return _libc
+
+
+class InotifyWatcher:
+    """Watches directories for changes to named files on the asyncio loop.
+
+    The inotify descriptor is read with loop.add_reader, so callbacks run on
+    the loop thread without a separate observer thread.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._libc = _get_libc()
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches = {}
+        self._reading = False
+
+    def watch(self, directory, names, mask, callback):
+        """Call callback(name, mask) for events on any of names in directory."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self._watches[wd] = (frozenset(names), callback)
+        if not self._reading:
+            self._loop.add_reader(self._fd, self._read_events)
+            self._reading = True
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            watch = self._watches.get(wd)
+            if watch is not None and name in watch[0]:
+                watch[1](name, mask)
+
+    def close(self):
+        if self._fd < 0:
+            return
+        if self._reading:
+            self._loop.remove_reader(self._fd)
+            self._reading = False
+        os.close(self._fd)
+        self._fd = -1
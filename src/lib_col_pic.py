@@ -33,11 +33,9 @@ def parse_thumbnail(img, width, height, default_background) -> str:
     output_data = bytearray(img_size[0] * img_size[1] * 10)
     ColPic_EncodeStr(color16, img_size[1], img_size[0], output_data, len(output_data), 1024)
 
-    result = ''.join(chr(byte) for byte in output_data if byte)
+    result = output_data.replace(b"\x00", b"").decode("latin-1")
     return result
 
-# Remaining functions unchanged but can be similarly optimized.
-
 def ColPic_EncodeStr(fromcolor16, picw, pich, outputdata: bytearray, outputmaxtsize, colorsmax):
     qty = ColPicEncode(fromcolor16, picw, pich, outputdata, outputmaxtsize, colorsmax)
     if qty == 0:
@@ -48,27 +46,20 @@ def ColPic_EncodeStr(fromcolor16, picw, pich, outputdata: bytearray, outputmaxts
     qty += padding
     outputdata.extend([0] * padding)
 
-    hexindex = qty
-    strindex = qty * 4 // 3
-    TempBytes = bytearray(4)
-
-    while hexindex > 0:
-        hexindex -= 3
-        strindex -= 4
-        TempBytes[0] = outputdata[hexindex] >> 2
-        TempBytes[1] = (outputdata[hexindex] & 0x03) << 4 | outputdata[hexindex + 1] >> 4
-        TempBytes[2] = (outputdata[hexindex + 1] & 0x0F) << 2 | outputdata[hexindex + 2] >> 6
-        TempBytes[3] = outputdata[hexindex + 2] & 0x3F
-
-        for k in range(4):
-            TempBytes[k] += 48
-            if TempBytes[k] == ord('\\'):
-                TempBytes[k] = 126
-
-        outputdata[int(strindex):int(strindex) + 4] = TempBytes
-
-    outputdata[int(qty * 4 // 3)] = 0
-    return qty * 4 // 3
+    # Encode every 3 bytes as 4 printable characters in one pass
+    data = np.frombuffer(bytes(outputdata[:qty]), dtype=np.uint8).reshape(-1, 3)
+    encoded = np.empty((len(data), 4), dtype=np.uint8)
+    encoded[:, 0] = data[:, 0] >> 2
+    encoded[:, 1] = (data[:, 0] & 0x03) << 4 | data[:, 1] >> 4
+    encoded[:, 2] = (data[:, 1] & 0x0F) << 2 | data[:, 2] >> 6
+    encoded[:, 3] = data[:, 2] & 0x3F
+    encoded += 48
+    encoded[encoded == ord('\\')] = 126
+
+    strqty = qty * 4 // 3
+    outputdata[:strqty] = encoded.tobytes()
+    outputdata[strqty] = 0
+    return strqty
 
 def ColPicEncode(fromcolor16, picw, pich, outputdata: bytearray, outputmaxtsize, colorsmax):
     Head0 = ColPicHead3()
@@ -76,30 +67,28 @@ def ColPicEncode(fromcolor16, picw, pich, outputdata: bytearray, outputmaxtsize,
     dotsqty = picw * pich
     colorsmax = min(colorsmax, 1024)
 
-    # Use NumPy to count unique colors and their frequencies
+    # Use NumPy to count unique colors and sort them by frequency (descending)
     unique_colors, counts = np.unique(fromcolor16, return_counts=True)
-    Listu16 = np.array([U16HEAD() for _ in range(len(unique_colors))])
-
-    for i, (color, qty) in enumerate(zip(unique_colors, counts)):
-        Listu16[i].colo16 = color
-        Listu16[i].qty = qty
-        Listu16[i].A0 = (color >> 11) & 31
-        Listu16[i].A1 = (color >> 5) & 63
-        Listu16[i].A2 = color & 31
-
-    # Sort the color list by frequency (descending)
-    Listu16 = sorted(Listu16, key=lambda x: x.qty, reverse=True)
-
-    # Reduce color list to `colorsmax` by merging similar colors
-    while len(Listu16) > colorsmax:
-        l0 = Listu16.pop()
-        cha = np.array([
-            abs(l0.A0 - u16.A0) + abs(l0.A1 - u16.A1) + abs(l0.A2 - u16.A2)
-            for u16 in Listu16
-        ])
-        fid = np.argmin(cha)
-        replacement_color = Listu16[fid].colo16
-        fromcolor16 = np.where(fromcolor16 == l0.colo16, replacement_color, fromcolor16)
+    palette = unique_colors[np.argsort(-counts, kind="stable")]
+
+    # Reduce the palette to `colorsmax` by merging the least frequent colors
+    # into their closest remaining color. Distances are computed in uint16
+    # and wrap, as they always have.
+    if len(palette) > colorsmax:
+        a0 = (palette >> 11) & 31
+        a1 = (palette >> 5) & 63
+        a2 = palette & 31
+        merged = np.arange(len(palette))
+        for last in range(len(palette) - 1, colorsmax - 1, -1):
+            cha = (a0[last] - a0[:last]) + (a1[last] - a1[:last]) + (a2[last] - a2[:last])
+            merged[last] = np.argmin(cha)
+        # Follow merges into colors that were themselves merged later on
+        for last in range(colorsmax, len(palette)):
+            merged[last] = merged[merged[last]]
+        lookup = np.arange(1 << 16, dtype=palette.dtype)
+        lookup[palette] = palette[merged]
+        fromcolor16 = lookup[fromcolor16]
+        palette = palette[:colorsmax]
 
     # Clear the output data
     outputdata[:] = bytearray(outputmaxtsize)
@@ -107,7 +96,7 @@ def ColPicEncode(fromcolor16, picw, pich, outputdata: bytearray, outputmaxtsize,
     # Set up header
     Head0.encodever = 3
     Head0.mark = 98419516
-    Head0.ListDataSize = len(Listu16) * 2
+    Head0.ListDataSize = len(palette) * 2
 
     # Write header information
     outputdata[0] = 3
@@ -116,10 +105,8 @@ def ColPicEncode(fromcolor16, picw, pich, outputdata: bytearray, outputmaxtsize,
 
     sizeofColPicHead3 = 32
 
-    # Convert the Listu16 color data to bytes
-    for i in range(len(Listu16)):
-        color_bytes = np.array([Listu16[i].colo16], dtype=np.uint16).view(np.uint8)
-        outputdata[sizeofColPicHead3 + i * 2: sizeofColPicHead3 + i * 2 + 2] = list(color_bytes)  # Convert to list of ints
+    # Write the palette as little-endian 16-bit colors
+    outputdata[sizeofColPicHead3:sizeofColPicHead3 + Head0.ListDataSize] = palette.astype("<u2").tobytes()
 
     enqty = Byte8bitEncode(
         fromcolor16,
@@ -170,43 +157,49 @@ def Byte8bitEncode(
     outputdataIndex,
     decMaxBytesize,
 ):
-    listu16 = outputdata
-    dots = 0
-    srcindex = 0
+    # Palette index of every color, first match wins
+    palette = {}
+    for i in range(listqty):
+        color = outputdata[i * 2 + 1 + listu16Index] << 8 | outputdata[i * 2 + listu16Index]
+        palette.setdefault(color, i)
+
+    # Split the image into runs of equal color, at most 255 dots each
+    pixels = np.asarray(fromcolor16[:dotsqty])
+    bounds = [0, *(np.flatnonzero(pixels[1:] != pixels[:-1]) + 1).tolist(), dotsqty]
+    colors = pixels.tolist()
+
     decindex = 0
     lastid = 0
 
-    while dotsqty > 0:
-        dots = min(255, next((i + 1 for i in range(dotsqty - 1) if fromcolor16[srcindex + i] != fromcolor16[srcindex + i + 1]), dotsqty))
-
-        temp = next((i for i in range(listqty) if listu16[i * 2 + 1 + listu16Index] << 8 | listu16[i * 2 + listu16Index] == fromcolor16[srcindex]), 0)
+    for start, end in zip(bounds, bounds[1:]):
+        temp = palette.get(colors[start], 0)
         tid = temp % 32
         sid = temp // 32
 
-        if lastid != sid:
-            if decindex >= decMaxBytesize:
-                break
-            outputdata[decindex + outputdataIndex] = 7 << 5 | sid
-            decindex += 1
-            lastid = sid
-
-        if dots <= 6:
-            if decindex >= decMaxBytesize:
-                break
-            outputdata[decindex + outputdataIndex] = dots << 5 | tid
-            decindex += 1
-        else:
-            if decindex >= decMaxBytesize:
-                break
-            outputdata[decindex + outputdataIndex] = tid
-            decindex += 1
-            if decindex >= decMaxBytesize:
-                break
-            outputdata[decindex + outputdataIndex] = dots
-            decindex += 1
-
-        srcindex += dots
-        dotsqty -= dots
+        for srcindex in range(start, end, 255):
+            dots = min(255, end - srcindex)
+
+            if lastid != sid:
+                if decindex >= decMaxBytesize:
+                    return decindex
+                outputdata[decindex + outputdataIndex] = 7 << 5 | sid
+                decindex += 1
+                lastid = sid
+
+            if dots <= 6:
+                if decindex >= decMaxBytesize:
+                    return decindex
+                outputdata[decindex + outputdataIndex] = dots << 5 | tid
+                decindex += 1
+            else:
+                if decindex >= decMaxBytesize:
+                    return decindex
+                outputdata[decindex + outputdataIndex] = tid
+                decindex += 1
+                if decindex >= decMaxBytesize:
+                    return decindex
+                outputdata[decindex + outputdataIndex] = dots
+                decindex += 1
 
     return decindex
 
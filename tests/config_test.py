@@ -65,3 +65,11 @@ def test_safe_get_no_option(tmp_path):
 
     assert config.safe_get("test", "t2") is None
     assert config.safe_get("test", "t2", "default") == "default"
+
+def test_get_section(tmp_path):
+    with open(str(tmp_path) + "/test_config.ini", "w") as f:
+        f.write("[test]\nt = t")
+    config = ConfigHandler(str(tmp_path) + "/test_config.ini", logger)
+
+    assert config.get_section("test")["t"] == "t"
+    assert config.get_section("test2") is None
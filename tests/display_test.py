@@ -0,0 +1,165 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+import display
+from src.config import ConfigHandler
+from src.mapping import (
+    PAGE_CONFIRM_PRINT,
+    PAGE_FILES,
+    PAGE_MAIN,
+    PAGE_OVERLAY_LOADING,
+    PAGE_PRINTING,
+    PAGE_PRINTING_STOP,
+    PAGE_SETTINGS,
+    PAGE_SHUTDOWN_DIALOG,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolate_module_state(monkeypatch):
+    monkeypatch.setattr(display.logger, "handlers", [])
+    # Loading the config replaces the shared filename regexes
+    for context, regex in list(display.filename_regex_wrapper.items()):
+        monkeypatch.setitem(display.filename_regex_wrapper, context, regex)
+
+
+def make_controller(tmp_path):
+    config = ConfigHandler(str(tmp_path / "display_connector.cfg"), display.logger)
+    config.set("general", "printer_model", "N4Pro")
+    controller = display.DisplayController(config)
+    controller._loop = asyncio.get_running_loop()
+    controller._send_moonraker_request = AsyncMock(return_value={"result": {}})
+
+    # Serialized like the serial communicator, which writes under a lock
+    pages = []
+    lock = asyncio.Lock()
+
+    async def navigate_to(page_id):
+        async with lock:
+            pages.append(page_id)
+
+    controller.display.navigate_to = navigate_to
+    controller.written_pages = pages
+    return controller
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_request_behind_loading_ends_on_overlay(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.history.extend([PAGE_MAIN, PAGE_SETTINGS, PAGE_SHUTDOWN_DIALOG])
+    controller.execute_action("reboot_klipper")
+    await _settle()
+
+    overlay = controller._page_id(PAGE_OVERLAY_LOADING)
+    assert controller.written_pages[-1] == overlay
+    assert list(controller.history) == [PAGE_MAIN, PAGE_SETTINGS, PAGE_OVERLAY_LOADING]
+    controller._send_moonraker_request.assert_awaited_once_with(
+        "machine.services.restart", {"service": "klipper"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_request_behind_loading_sent_when_display_fails(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.display.navigate_to = AsyncMock(side_effect=OSError("display gone"))
+    controller.history.extend([PAGE_MAIN, PAGE_SETTINGS, PAGE_SHUTDOWN_DIALOG])
+    controller.execute_action("reboot_klipper")
+    results = await asyncio.gather(
+        *controller._background_tasks, return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [OSError]
+    controller._send_moonraker_request.assert_awaited_once_with(
+        "machine.services.restart", {"service": "klipper"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_stop_print_ends_on_overlay(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.history.extend([PAGE_MAIN, PAGE_PRINTING, PAGE_PRINTING_STOP])
+    controller.execute_action("stop_print")
+    await _settle()
+
+    assert controller.written_pages[-1] == controller._page_id(PAGE_OVERLAY_LOADING)
+    assert list(controller.history) == [PAGE_MAIN, PAGE_PRINTING, PAGE_OVERLAY_LOADING]
+    controller._send_moonraker_request.assert_awaited_once_with(
+        "printer.print.cancel", None
+    )
+
+
+@pytest.mark.asyncio
+async def test_stop_print_sent_when_display_fails(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.display.navigate_to = AsyncMock(side_effect=OSError("display gone"))
+    controller.history.extend([PAGE_MAIN, PAGE_PRINTING, PAGE_PRINTING_STOP])
+    controller.execute_action("stop_print")
+    await asyncio.gather(*controller._background_tasks, return_exceptions=True)
+
+    controller._send_moonraker_request.assert_awaited_once_with(
+        "printer.print.cancel", None
+    )
+
+
+@pytest.mark.asyncio
+async def test_print_opened_file_ends_on_overlay(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.history.extend([PAGE_MAIN, PAGE_FILES, PAGE_CONFIRM_PRINT])
+    controller.current_filename = "benchy.gcode"
+    controller.execute_action("print_opened_file")
+    await _settle()
+
+    assert controller.written_pages[-1] == controller._page_id(PAGE_OVERLAY_LOADING)
+    assert list(controller.history) == [PAGE_MAIN, PAGE_FILES, PAGE_OVERLAY_LOADING]
+    controller._send_moonraker_request.assert_awaited_once_with(
+        "printer.print.start", {"filename": "benchy.gcode"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_reload_config_goes_back_on_bad_regex(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.history.extend([PAGE_MAIN, PAGE_SETTINGS])
+    controller.config.set("general", "clean_filename_regex", "(unclosed")
+    controller.config.write_changes()
+    await controller._reload_config()
+    await _settle()
+
+    assert controller.written_pages[-1] == controller._page_id(PAGE_SETTINGS)
+    assert list(controller.history) == [PAGE_MAIN, PAGE_SETTINGS]
+
+
+@pytest.mark.asyncio
+async def test_reload_config_runs_when_display_fails(tmp_path):
+    controller = make_controller(tmp_path)
+    controller.history.extend([PAGE_MAIN, PAGE_SETTINGS])
+    controller.display.navigate_to = AsyncMock(side_effect=OSError("display gone"))
+    controller.config.set("general", "filament_sensor_name", "runout")
+    controller.config.write_changes()
+    await controller._reload_config()
+    await asyncio.gather(*controller._background_tasks, return_exceptions=True)
+
+    assert controller.filament_sensor_name == "runout"
+    assert list(controller.history) == [PAGE_MAIN, PAGE_SETTINGS]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_display_update_is_closed(tmp_path):
+    controller = make_controller(tmp_path)
+    for _ in range(display.DISPLAY_TASK_LIMIT):
+        await controller._display_sem.acquire()
+    coro = controller.display.navigate_to("1")
+    task = controller._spawn_display(coro)
+    await _settle()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert coro.cr_frame is None
+    assert controller.written_pages == []
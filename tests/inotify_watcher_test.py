@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+import pytest
+
+from src.inotify_watcher import IN_CREATE, IN_DELETE, IN_MODIFY, InotifyWatcher
+
+
+async def _wait_for(events, count):
+    for _ in range(100):
+        if len(events) >= count:
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_watch_reports_named_files(tmp_path):
+    events = []
+    watcher = InotifyWatcher(asyncio.get_running_loop())
+    try:
+        watcher.watch(
+            str(tmp_path),
+            ["watched.cfg"],
+            IN_MODIFY | IN_CREATE | IN_DELETE,
+            lambda name, mask: events.append((name, mask)),
+        )
+        (tmp_path / "watched.cfg").write_text("a")
+        os.remove(tmp_path / "watched.cfg")
+        await _wait_for(events, 3)
+    finally:
+        watcher.close()
+
+    assert [name for name, _ in events] == ["watched.cfg"] * 3
+    assert events[0][1] & IN_CREATE
+    assert events[1][1] & IN_MODIFY
+    assert events[2][1] & IN_DELETE
+
+
+@pytest.mark.asyncio
+async def test_watch_ignores_other_files(tmp_path):
+    events = []
+    watcher = InotifyWatcher(asyncio.get_running_loop())
+    try:
+        watcher.watch(
+            str(tmp_path),
+            ["watched.cfg"],
+            IN_CREATE,
+            lambda name, mask: events.append(name),
+        )
+        (tmp_path / "other.cfg").write_text("a")
+        (tmp_path / "watched.cfg").write_text("a")
+        await _wait_for(events, 1)
+        await asyncio.sleep(0.05)
+    finally:
+        watcher.close()
+
+    assert events == ["watched.cfg"]
+
+
+@pytest.mark.asyncio
+async def test_watch_missing_directory(tmp_path):
+    watcher = InotifyWatcher(asyncio.get_running_loop())
+    try:
+        with pytest.raises(FileNotFoundError):
+            watcher.watch(str(tmp_path / "missing"), ["a"], IN_CREATE, print)
+    finally:
+        watcher.close()
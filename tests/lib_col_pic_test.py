@@ -0,0 +1,45 @@
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from src.lib_col_pic import parse_thumbnail
+
+
+def few_colors_image():
+    # Flat runs, a gradient and translucent pixels, well under 1024 colors
+    pixels = np.zeros((8, 12, 4), dtype=np.uint8)
+    pixels[:, :, 3] = 255
+    pixels[:4, :6] = (255, 0, 0, 255)
+    pixels[:4, 6:] = (0, 0, 255, 128)
+    pixels[4:, :, 0] = np.arange(12) * 20
+    pixels[4:, :, 1] = 100
+    pixels[6:, :, 3] = 0
+    return Image.fromarray(pixels, "RGBA")
+
+
+def many_colors_image():
+    # 1350 distinct 16 bit colors, so the palette has to be merged down
+    y, x = np.mgrid[0:40, 0:40]
+    pixels = np.zeros((40, 40, 3), dtype=np.uint8)
+    pixels[:, :, 0] = x * 6
+    pixels[:, :, 1] = y * 6
+    pixels[:, :, 2] = (x + y) * 3
+    return Image.fromarray(pixels, "RGB")
+
+
+def test_parse_thumbnail_few_colors():
+    encoded = parse_thumbnail(few_colors_image(), 12, 8, "29354a")
+    assert encoded == (
+        "0`0000`000080000?<?M1Ah0000R000000000000003D4:TY0?PP0b0C82~P>b1C86"
+        "<PNb2;8:<P~b3;8=_2`<;0`~32`2<T9BHW:2TZ:b`];R<T9BHW:2TZ:b`];P4H"
+    )
+
+
+def test_parse_thumbnail_merges_palette():
+    encoded = parse_thumbnail(many_colors_image(), 40, 40, "#29354a")
+    assert len(encoded) == 6068
+    assert (
+        hashlib.sha256(encoded.encode("latin-1")).hexdigest()
+        == "ecc8cf75f690a3c83462caa7b273ae875b483aa9c3906139dee6c440a48f9a7d"
+    )